@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Extraction Benchmark
+Compares the one-pass extractor against the old per-pattern findall version
+on short turns and long pasted scam scripts
+"""
+
+import os
+import re
+import time
+import timeit
+
+os.environ.setdefault("GEMINI_API_KEY", "bench")  # main.py refuses to import without it
+
+from main import extract_intelligence_advanced
+from intel_store import IntelStore
+
+# Configuration
+REPEAT = 5
+
+# Short single-turn messages
+SHORT_MESSAGES = [
+    "Aapka bank account block ho jayega. Immediately verify karo.",
+    "Call karo is number pe: 9876543210. Confirm karna hai details.",
+    "Ya phir UPI se bhi bhej sakte ho: scammer@paytm pe.",
+    "Main Rajesh Kumar, RBI officer. Delhi office se call kar raha hoon. Pincode 110001.",
+]
+
+# Long pasted scam script (what we see when scammers dump a whole template)
+SCRIPT_LINES = [
+    "Dear customer, your SBI account 1234 5678 9012 will be blocked today.",
+    "Verify immediately at https://fake-sbi-verify.com/login?ref=110001 or call +91 9876543210.",
+    "Send Rs 10 to refund.desk@oksbi or helpdesk@fakesbi.com for KYC update.",
+    "This is Amit Sharma from RBI head office, IFSC HDFC0001234, branch 400001.",
+    "Alternate number 09123456789, account 567890123456789 for transfer.",
+    "Aapka paisa safe hai, bas OTP share karo jaldi, warna legal action hoga.",
+]
+LONG_SCRIPT = "\n".join(SCRIPT_LINES * 40)
+
+
+# Old implementation, kept verbatim as the reference
+def legacy_extract(text: str, existing_intel: dict) -> dict:
+    """Enhanced extraction with deduplication"""
+    
+    # Bank accounts - multiple formats
+    bank_patterns = [
+        r'\b\d{11,18}\b',  # 9-18 digits
+        r'\b\d{4}[-\s]?\d{4}[-\s]?\d{4,10}\b',  # Formatted
+    ]
+    
+    for pattern in bank_patterns:
+        matches = re.findall(pattern, text)
+        for match in matches:
+            clean = re.sub(r'[-\s]', '', match)
+            if 11 <= len(clean) <= 18 and clean not in existing_intel['bankAccounts']:
+                existing_intel['bankAccounts'].append(clean)
+    
+    # UPI IDs
+    upi_pattern = r'([a-zA-Z0-9.\-_]{2,}@(upi|paytm|ybl|apl|okaxis|oksbi|okicici|gpay))'
+
+    matches = re.findall(upi_pattern, text, re.IGNORECASE)
+
+    for full, provider in matches:
+        upi = full.strip().lower()
+        if upi not in existing_intel['upiIds']:
+            existing_intel['upiIds'].append(upi)
+
+    
+    # Phone numbers - multiple formats
+    phone_patterns = [
+        r'\+91[-\s]?\d{10}',
+        r'\b[6-9]\d{9}\b',
+        r'\b0\d{10}\b'
+    ]
+    
+    for pattern in phone_patterns:
+        matches = re.findall(pattern, text)
+        for match in matches:
+            clean = re.sub(r'[-\s]', '', match)
+            if clean not in existing_intel['phoneNumbers']:
+                existing_intel['phoneNumbers'].append(clean)
+    
+    # URLs
+    url_pattern = r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+'
+    urls = re.findall(url_pattern, text)
+    for url in urls:
+        url = url.rstrip('.,)')
+        if url not in existing_intel['phishingLinks']:
+            existing_intel['phishingLinks'].append(url)
+    
+    # Email addresses (for scammer contact)
+    email_pattern = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
+    emails = re.findall(email_pattern, text)
+    for email in emails:
+        if email not in existing_intel.get('emailAddresses', []):
+            if 'emailAddresses' not in existing_intel:
+                existing_intel['emailAddresses'] = []
+            existing_intel['emailAddresses'].append(email)
+    
+    # Names (basic detection - capitalized words)
+    # Look for "My name is X" or "I am X from"
+    name_patterns = [
+    r'(?:my name is|i am|this is)\s+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)?)',
+    r'([A-Z][a-z]+\s+[A-Z][a-z]+)\s+(?:from|speaking|here)',
+    r'(?:main|mai|main hoon|i am)\s+([A-Z][a-z]+\s+[A-Z][a-z]+)',
+    r'([A-Z][a-z]+\s+[A-Z][a-z]+),?\s+(?:rbi|bank|officer)'
+    ]
+
+    for pattern in name_patterns:
+        names = re.findall(pattern, text, re.IGNORECASE)
+        for name in names:
+            if isinstance(name, tuple):
+                name = name[0] if name[0] else name[1]
+            name = name.strip()
+            if len(name) > 2 and name not in existing_intel.get('scammerNames', []):
+                if 'scammerNames' not in existing_intel:
+                    existing_intel['scammerNames'] = []
+                existing_intel['scammerNames'].append(name)
+    
+    # Addresses (basic detection - pincode based)
+    pincode_pattern = r'\b[1-9]\d{5}\b'
+    pincodes = re.findall(pincode_pattern, text)
+    for pin in pincodes:
+        if pin not in existing_intel.get('pincodes', []):
+            if 'pincodes' not in existing_intel:
+                existing_intel['pincodes'] = []
+            existing_intel['pincodes'].append(pin)
+    
+    # IFSC codes
+    ifsc_pattern = r'\b[A-Z]{4}0[A-Z0-9]{6}\b'
+    ifsc_codes = re.findall(ifsc_pattern, text)
+    for code in ifsc_codes:
+        if code not in existing_intel.get('ifscCodes', []):
+            if 'ifscCodes' not in existing_intel:
+                existing_intel['ifscCodes'] = []
+            existing_intel['ifscCodes'].append(code)
+    
+    # Store raw text snippets that might contain addresses or other info
+    # This catches anything we might have missed
+    if len(text) > 20:  # Only store substantial messages
+        if 'rawMessages' not in existing_intel:
+            existing_intel['rawMessages'] = []
+        if text not in existing_intel['rawMessages']:
+            existing_intel['rawMessages'].append(text[:200])  # First 200 chars
+    
+    return existing_intel
+
+
+
+def empty_intel():
+    return {
+        "upiIds": [],
+        "bankAccounts": [],
+        "phoneNumbers": [],
+        "phishingLinks": [],
+        "emailAddresses": [],
+        "scammerNames": [],
+        "pincodes": [],
+        "ifscCodes": [],
+        "rawMessages": []
+    }
+
+def same_result(text):
+    """Both extractors must agree (order aside)"""
+    old = legacy_extract(text, empty_intel())
+    new = extract_intelligence_advanced(text, IntelStore()).to_dict()
+    return all(sorted(old[k]) == sorted(new[k]) for k in old)
+
+def bench(label, text, number):
+    """Time both extractors on one input"""
+    old = min(timeit.repeat(lambda: legacy_extract(text, empty_intel()), number=number, repeat=REPEAT))
+    new = min(timeit.repeat(lambda: extract_intelligence_advanced(text, IntelStore()), number=number, repeat=REPEAT))
+    old_us = old / number * 1e6
+    new_us = new / number * 1e6
+    print(f"{label:<28} {len(text):>7} chars   old {old_us:>9.1f} us   new {new_us:>9.1f} us   x{old_us / new_us:.2f}")
+
+def main():
+    print("\n" + "="*70)
+    print("  INTELLIGENCE EXTRACTION BENCHMARK")
+    print("="*70)
+
+    for text in SHORT_MESSAGES + [LONG_SCRIPT]:
+        if not same_result(text):
+            print(f"❌ Mismatch on: {text[:60]}")
+
+    print()
+    for i, text in enumerate(SHORT_MESSAGES, 1):
+        bench(f"short turn {i}", text, 2000)
+    bench("long pasted script", LONG_SCRIPT, 20)
+
+    print("\n" + "="*70)
+
+if __name__ == "__main__":
+    main()
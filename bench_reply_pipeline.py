@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Reply Pipeline Benchmark
+Compares the compiled reply pipeline against the old per-word re.sub
+post-processing on typical model replies
+"""
+
+import re
+import timeit
+
+from reply_pipeline import ReplyPipeline
+
+# Configuration
+REPEAT = 5
+NUMBER = 5000
+
+# Typical raw model replies (before post-processing)
+REPLIES = [
+    "Haan ji, kya hua? Aap apna number batao.",
+    "Arre sir, mera account kyun block hoga? Main abhi bank jaake check karta hoon. Aap kaun se branch se bol rahe ho?",
+    "I am confused... my son handles the loan and EMI stuff. Can you send the link again? It is not opening.",
+    "मुझे समझ नहीं आया। आप कौन बोल रहे हैं? कृपया अपना नंबर बताइए।",
+    "Wait 😟 family ko poochna padega!! Aapka UPI ID kya hai? Main payment try karta hoon. Ek minute.",
+    "Ok " + "this is a very long rambling reply without any sentence end " * 4,
+]
+
+
+def legacy_postprocess(text: str) -> str:
+    """The old ask_gemini_enhanced post-processing, kept for comparison"""
+    text = text.strip()
+
+    # Keep ASCII + Devanagari
+    text = ''.join(c for c in text if c.isascii() or '\u0900' <= c <= '\u097F')
+
+    # Normalize spaces
+    text = re.sub(r'\s+', ' ', text).strip()
+
+    # Remove banned words safely
+    ban_words = [
+        "salary", "rent", "mummy", "papa", "fees", "bp",
+        "tension", "savings", "family", "bacha", "health",
+        "income", "loan", "emi", "daughter", "son"
+    ]
+
+    for word in ban_words:
+        text = re.sub(rf'\b{word}\b', '', text, flags=re.IGNORECASE)
+
+    text = re.sub(r'\s+', ' ', text).strip()
+
+    # Sentence-aware trimming
+    parts = re.split(r'(?<=[.!?])\s+', text)
+
+    text = " ".join(parts[:2]).strip()
+
+    MAX_LEN = 150
+
+    if len(text) > MAX_LEN:
+        cut = text[:MAX_LEN]
+
+        m = re.search(r'[.!?](?!.*[.!?])', cut)
+
+        if m:
+            text = cut[:m.end()]
+        else:
+            text = cut.rsplit(" ", 1)[0]
+
+    return text
+
+
+def bench(label, text, pipeline):
+    """Time both post-processors on one reply"""
+    old = min(timeit.repeat(lambda: legacy_postprocess(text), number=NUMBER, repeat=REPEAT))
+    new = min(timeit.repeat(lambda: pipeline(text), number=NUMBER, repeat=REPEAT))
+    old_us = old / NUMBER * 1e6
+    new_us = new / NUMBER * 1e6
+    print(f"{label:<12} {len(text):>5} chars   old {old_us:>7.1f} us   new {new_us:>7.1f} us   x{old_us / new_us:.2f}")
+
+
+def main():
+    pipeline = ReplyPipeline(stages=("script", "ban_words", "trim"), max_len=150, max_sentences=2)
+
+    print("\n" + "="*70)
+    print("  REPLY POST-PROCESSING BENCHMARK")
+    print("="*70)
+
+    for text in REPLIES:
+        if legacy_postprocess(text) != pipeline(text):
+            print(f"❌ Mismatch on: {text[:60]}")
+
+    print()
+    for i, text in enumerate(REPLIES, 1):
+        bench(f"reply {i}", text, pipeline)
+
+    print("\n" + "="*70)
+
+
+if __name__ == "__main__":
+    main()
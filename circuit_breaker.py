@@ -0,0 +1,226 @@
+"""
+Circuit Breaker + Adaptive Timeout for the model call
+The breaker opens when too many recent calls fail or time out, rejects
+calls instantly while open (callers serve local fallbacks), then lets a few
+probe calls through to decide whether to close again. The timeout follows a
+rolling latency histogram instead of a constant.
+"""
+
+import os
+import time
+from bisect import bisect_left
+from collections import deque
+
+# ========================
+# Tuning
+# ========================
+BREAKER_ENABLED = os.getenv("BREAKER_ENABLED", "1") == "1"
+BREAKER_WINDOW_SECONDS = float(os.getenv("BREAKER_WINDOW_SECONDS", "30"))
+BREAKER_MIN_CALLS = int(os.getenv("BREAKER_MIN_CALLS", "10"))  # in the window, before the rate counts
+BREAKER_FAILURE_RATE = float(os.getenv("BREAKER_FAILURE_RATE", "0.5"))
+BREAKER_OPEN_SECONDS = float(os.getenv("BREAKER_OPEN_SECONDS", "15"))
+BREAKER_PROBES = int(os.getenv("BREAKER_PROBES", "2"))  # concurrent calls allowed while half-open
+
+TIMEOUT_ADAPTIVE = os.getenv("GEMINI_TIMEOUT_ADAPTIVE", "1") == "1"
+TIMEOUT_MIN = float(os.getenv("GEMINI_TIMEOUT_MIN", "2"))
+TIMEOUT_PERCENTILE = float(os.getenv("GEMINI_TIMEOUT_PERCENTILE", "0.99"))
+TIMEOUT_MULTIPLIER = float(os.getenv("GEMINI_TIMEOUT_MULTIPLIER", "2"))
+TIMEOUT_MIN_SAMPLES = int(os.getenv("GEMINI_TIMEOUT_MIN_SAMPLES", "20"))
+TIMEOUT_WINDOW_SECONDS = float(os.getenv("GEMINI_TIMEOUT_WINDOW_SECONDS", "120"))
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the model while the breaker is open"""
+
+
+# ========================
+# 1. CIRCUIT BREAKER
+# ========================
+class CircuitBreaker:
+    """closed -> open on failure rate -> half_open after a pause -> closed on a good probe"""
+
+    def __init__(
+        self,
+        enabled: bool = BREAKER_ENABLED,
+        window_seconds: float = BREAKER_WINDOW_SECONDS,
+        min_calls: int = BREAKER_MIN_CALLS,
+        failure_rate: float = BREAKER_FAILURE_RATE,
+        open_seconds: float = BREAKER_OPEN_SECONDS,
+        probes: int = BREAKER_PROBES,
+        clock=time.monotonic
+    ):
+        self.enabled = enabled
+        self.window_seconds = window_seconds
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.open_seconds = open_seconds
+        self.probes = probes
+        self.clock = clock
+        self.state = CLOSED
+        self._outcomes = deque()  # (time, ok) of recent calls
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+
+        # Metrics
+        self.opened = 0
+        self.rejected = 0
+
+    def allow(self) -> bool:
+        """May a call go out now? Every True must be followed by one record()"""
+        if not self.enabled:
+            return True
+        if self.state == OPEN:
+            if self.clock() - self._opened_at < self.open_seconds:
+                self.rejected += 1
+                return False
+            self.state = HALF_OPEN
+            self._probes_in_flight = 0
+        if self.state == HALF_OPEN:
+            if self._probes_in_flight >= self.probes:
+                self.rejected += 1
+                return False
+            self._probes_in_flight += 1
+        return True
+
+    def record(self, ok):
+        """Outcome of an allowed call: True / False, None if it was abandoned (no verdict)"""
+        if not self.enabled:
+            return
+        if self.state == HALF_OPEN:
+            self._probes_in_flight = max(0, self._probes_in_flight - 1)
+            if ok:
+                self._close()
+            elif ok is False:
+                self._open()
+            return
+        if ok is None or self.state == OPEN:
+            return
+
+        now = self.clock()
+        self._outcomes.append((now, ok))
+        if not ok:
+            self._failures += 1
+        self._expire(now)
+        calls = len(self._outcomes)
+        if calls >= self.min_calls and self._failures / calls >= self.failure_rate:
+            self._open()
+
+    def _expire(self, now: float):
+        horizon = now - self.window_seconds
+        while self._outcomes and self._outcomes[0][0] < horizon:
+            _, ok = self._outcomes.popleft()
+            if not ok:
+                self._failures -= 1
+
+    def _open(self):
+        self.state = OPEN
+        self._opened_at = self.clock()
+        self.opened += 1
+        print(f"⚡ CIRCUIT OPEN: model calls paused for {self.open_seconds:g}s, serving local replies")
+
+    def _close(self):
+        self.state = CLOSED
+        self._outcomes.clear()
+        self._failures = 0
+        print("✅ CIRCUIT CLOSED: model calls resumed")
+
+    def stats(self) -> dict:
+        self._expire(self.clock())
+        calls = len(self._outcomes)
+        return {
+            "enabled": self.enabled,
+            "state": self.state,
+            "window_calls": calls,
+            "window_failure_rate": round(self._failures / calls, 3) if calls else 0.0,
+            "opened": self.opened,
+            "rejected": self.rejected
+        }
+
+
+# ========================
+# 2. ROLLING LATENCY HISTOGRAM + ADAPTIVE TIMEOUT
+# ========================
+class LatencyHistogram:
+    """Log-spaced buckets over two rotating windows (current + previous)"""
+
+    # 10ms .. ~60s, 20% apart
+    BOUNDS = tuple(0.01 * 1.2 ** i for i in range(48))
+
+    def __init__(self, window_seconds: float = TIMEOUT_WINDOW_SECONDS, clock=time.monotonic):
+        self.window_seconds = window_seconds
+        self.clock = clock
+        self._current = [0] * (len(self.BOUNDS) + 1)
+        self._previous = [0] * (len(self.BOUNDS) + 1)
+        self._rotated_at = clock()
+
+    def _rotate(self):
+        now = self.clock()
+        if now - self._rotated_at >= self.window_seconds:
+            stale = now - self._rotated_at >= 2 * self.window_seconds
+            self._previous = [0] * len(self._current) if stale else self._current
+            self._current = [0] * len(self._previous)
+            self._rotated_at = now
+
+    def observe(self, seconds: float):
+        self._rotate()
+        self._current[bisect_left(self.BOUNDS, seconds)] += 1
+
+    def count(self) -> int:
+        self._rotate()
+        return sum(self._current) + sum(self._previous)
+
+    def percentile(self, q: float):
+        """Upper bound of the bucket holding the q-th sample, None when empty"""
+        self._rotate()
+        counts = [a + b for a, b in zip(self._current, self._previous)]
+        total = sum(counts)
+        if not total:
+            return None
+        rank = q * total
+        seen = 0
+        for i, count in enumerate(counts):
+            seen += count
+            if seen >= rank and count:
+                return self.BOUNDS[i] if i < len(self.BOUNDS) else self.BOUNDS[-1]
+        return self.BOUNDS[-1]
+
+
+class AdaptiveTimeout:
+    """Timeout = latency percentile x multiplier, clamped to [minimum, maximum]"""
+
+    def __init__(
+        self,
+        maximum: float,
+        minimum: float = TIMEOUT_MIN,
+        percentile: float = TIMEOUT_PERCENTILE,
+        multiplier: float = TIMEOUT_MULTIPLIER,
+        enabled: bool = TIMEOUT_ADAPTIVE
+    ):
+        self.maximum = maximum
+        self.minimum = min(minimum, maximum)
+        self.percentile = percentile
+        self.multiplier = multiplier
+        self.enabled = enabled
+        self.histogram = LatencyHistogram()
+
+    def observe(self, seconds: float):
+        """Feed call latency; timed-out calls are fed the timeout they hit"""
+        self.histogram.observe(seconds)
+
+    def value(self) -> float:
+        if not self.enabled or self.histogram.count() < TIMEOUT_MIN_SAMPLES:
+            return self.maximum
+        latency = self.histogram.percentile(self.percentile)
+        return max(self.minimum, min(self.maximum, latency * self.multiplier))
+
+    def stats(self) -> dict:
+        return {
+            "adaptive": self.enabled,
+            "current_s": round(self.value(), 2),
+            "min_s": self.minimum,
+            "max_s": self.maximum,
+            "samples": self.histogram.count()
+        }
@@ -0,0 +1,219 @@
+"""
+Gemini Key Pool - several API keys (x optional models) behind one router
+Each key/model pair is a route with a local RPM / TPM budget; routes that
+get a 429 cool down for a while. Calls go round-robin or to the least
+loaded route, so adding keys raises the throughput ceiling without code
+changes.
+"""
+
+import itertools
+import os
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# ========================
+# Tuning
+# ========================
+GEMINI_ROUTING = os.getenv("GEMINI_ROUTING", "least_loaded")  # least_loaded | round_robin
+GEMINI_KEY_RPM = int(os.getenv("GEMINI_KEY_RPM", "0"))  # requests / minute per route, 0 = no local limit
+GEMINI_KEY_TPM = int(os.getenv("GEMINI_KEY_TPM", "0"))  # tokens / minute per route, 0 = no local limit
+GEMINI_COOLDOWN_SECONDS = float(os.getenv("GEMINI_COOLDOWN_SECONDS", "30"))  # after a 429
+GEMINI_OUTPUT_TOKENS = int(os.getenv("GEMINI_OUTPUT_TOKENS", "80"))  # reserved per call until usage is known
+
+BUDGET_WINDOW_SECONDS = 60.0
+ROUTING_MODES = ("least_loaded", "round_robin")
+
+
+class QuotaExhaustedError(Exception):
+    """Every route is over its local budget or cooling down"""
+
+
+def is_rate_limited(error: Exception) -> bool:
+    """genai APIError carries the HTTP status in .code"""
+    return getattr(error, "code", None) == 429
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough prompt size (~4 chars per token) until the API reports usage"""
+    return len(text) // 4 + 1
+
+
+def key_label(index: int) -> str:
+    """Safe name for metrics/logs/health - no part of the key itself"""
+    return f"key{index}"
+
+
+class Route:
+    """One API key + model: its client, rolling budget window and metrics"""
+
+    def __init__(self, name: str, client, model: str, rpm: int, tpm: int):
+        self.name = name
+        self.client = client
+        self.model = model
+        self.rpm = rpm
+        self.tpm = tpm
+        self._window = deque()  # [time, tokens] per call in the last minute
+        self._window_tokens = 0
+        self.cooldown_until = 0.0
+
+        # Metrics
+        self.in_flight = 0
+        self.calls = 0
+        self.errors = 0
+        self.rate_limited = 0
+        self.tokens = 0
+
+    def _expire(self, now: float):
+        horizon = now - BUDGET_WINDOW_SECONDS
+        while self._window and self._window[0][0] < horizon:
+            self._window_tokens -= self._window.popleft()[1]
+
+    def usage(self, now: float) -> float:
+        """Share of the tighter budget used in the last minute (0 when unlimited)"""
+        self._expire(now)
+        used = 0.0
+        if self.rpm:
+            used = len(self._window) / self.rpm
+        if self.tpm:
+            used = max(used, self._window_tokens / self.tpm)
+        return used
+
+    def available(self, now: float, tokens: int) -> bool:
+        if now < self.cooldown_until:
+            return False
+        self._expire(now)
+        if self.rpm and len(self._window) >= self.rpm:
+            return False
+        if self.tpm and self._window_tokens + tokens > self.tpm:
+            return False
+        return True
+
+    def reserve(self, now: float, tokens: int) -> list:
+        entry = [now, tokens]
+        self._window.append(entry)
+        self._window_tokens += tokens
+        self.tokens += tokens
+        self.calls += 1
+        return entry
+
+    def settle(self, entry: list, tokens: int):
+        """Replace the reserved estimate with the reported token count"""
+        delta = tokens - entry[1]
+        entry[1] = tokens
+        self.tokens += delta
+        if self._window and self._window[0][0] <= entry[0]:
+            self._window_tokens += delta
+
+    def stats(self, now: float) -> dict:
+        self._expire(now)
+        return {
+            "route": self.name,
+            "model": self.model,
+            "in_flight": self.in_flight,
+            "calls": self.calls,
+            "errors": self.errors,
+            "rate_limited": self.rate_limited,
+            "tokens": self.tokens,
+            "rpm_used": len(self._window),
+            "tpm_used": self._window_tokens,
+            "cooling_down_s": round(max(0.0, self.cooldown_until - now), 1)
+        }
+
+
+class Lease:
+    """One call on a route; settle() records the real token usage"""
+
+    __slots__ = ("route", "entry")
+
+    def __init__(self, route: Route, entry: list):
+        self.route = route
+        self.entry = entry
+
+    @property
+    def client(self):
+        return self.route.client
+
+    @property
+    def model(self) -> str:
+        return self.route.model
+
+    def settle(self, response):
+        usage = getattr(response, "usage_metadata", None)
+        total = getattr(usage, "total_token_count", None) if usage is not None else None
+        if total:
+            self.route.settle(self.entry, total)
+
+
+class KeyPool:
+    """Routes for every (key, model) pair + the routing policy"""
+
+    def __init__(
+        self,
+        keys: list,
+        models: list,
+        client_factory,
+        routing: str = GEMINI_ROUTING,
+        rpm: int = GEMINI_KEY_RPM,
+        tpm: int = GEMINI_KEY_TPM,
+        cooldown_seconds: float = GEMINI_COOLDOWN_SECONDS,
+        clock=time.monotonic
+    ):
+        if routing not in ROUTING_MODES:
+            raise ValueError(f"GEMINI_ROUTING must be one of {', '.join(ROUTING_MODES)}")
+        self.routing = routing
+        self.cooldown_seconds = cooldown_seconds
+        self.clock = clock
+        self.routes = []
+        for index, key in enumerate(keys, 1):
+            client = client_factory(key)
+            for model in models:
+                self.routes.append(Route(f"{key_label(index)}/{model}", client, model, rpm, tpm))
+        self._cycle = itertools.cycle(range(len(self.routes)))
+
+        # Metrics
+        self.exhausted = 0
+
+    def _pick(self, tokens: int) -> Route:
+        now = self.clock()
+        if self.routing == "round_robin":
+            for _ in range(len(self.routes)):
+                route = self.routes[next(self._cycle)]
+                if route.available(now, tokens):
+                    return route
+        else:
+            candidates = [route for route in self.routes if route.available(now, tokens)]
+            if candidates:
+                # Fewest calls running, then most budget left, then config order
+                return min(candidates, key=lambda route: (route.in_flight, route.usage(now)))
+        self.exhausted += 1
+        raise QuotaExhaustedError("all Gemini keys over budget or cooling down")
+
+    @contextmanager
+    def use(self, prompt: str):
+        """Pick a route for one call; 429s put the route on cooldown"""
+        tokens = estimate_tokens(prompt) + GEMINI_OUTPUT_TOKENS
+        route = self._pick(tokens)
+        lease = Lease(route, route.reserve(self.clock(), tokens))
+        route.in_flight += 1
+        try:
+            yield lease
+        except Exception as e:
+            route.errors += 1
+            if is_rate_limited(e):
+                route.rate_limited += 1
+                route.cooldown_until = self.clock() + self.cooldown_seconds
+                print(f"🧊 GEMINI 429 on {route.name} - cooling down {self.cooldown_seconds:g}s")
+            raise
+        finally:
+            route.in_flight -= 1
+
+    def stats(self) -> dict:
+        now = self.clock()
+        return {
+            "routing": self.routing,
+            "routes": len(self.routes),
+            "available": sum(1 for route in self.routes if route.available(now, 0)),
+            "exhausted": self.exhausted,
+            "per_route": [route.stats(now) for route in self.routes]
+        }
@@ -0,0 +1,332 @@
+"""
+Gemini Pool - native async model calls with bounded concurrency
+Uses the async genai client, so a timeout really cancels the request instead
+of leaving a worker thread running; a semaphore caps concurrent model calls.
+Optional hedging: a call still running past the rolling p90 gets a second,
+identical request; the first to answer wins and the other is cancelled.
+Optional streaming: chunks are handed to a callback as they arrive and the
+stream is closed as soon as the callback has enough.
+Every call goes through a circuit breaker and an adaptive timeout - see
+circuit_breaker.py. Both only see the model call itself: the timeout starts
+once a slot is acquired, and a call that gives up while still queued
+(GEMINI_QUEUE_TIMEOUT) is not held against the model. Each model call picks an API key / model route from the
+key pool - see gemini_keys.py. admit() is the load-shedding check: above the high-water
+mark of running + queued calls, callers answer locally instead of queueing.
+"""
+
+import asyncio
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
+from circuit_breaker import CircuitBreaker, AdaptiveTimeout, CircuitOpenError
+from gemini_keys import KeyPool, QuotaExhaustedError, is_rate_limited
+from metrics import latency_summary
+from tracing import record_stage
+
+# ========================
+# Tuning
+# ========================
+GEMINI_CONCURRENCY = int(os.getenv("GEMINI_CONCURRENCY", "32"))
+GEMINI_TIMEOUT = float(os.getenv("GEMINI_TIMEOUT", "8"))  # ceiling of the adaptive timeout
+GEMINI_QUEUE_TIMEOUT = float(os.getenv("GEMINI_QUEUE_TIMEOUT", "2"))  # max wait for a slot
+GEMINI_HEDGE = os.getenv("GEMINI_HEDGE", "0") == "1"
+GEMINI_HEDGE_PERCENTILE = float(os.getenv("GEMINI_HEDGE_PERCENTILE", "0.9"))  # hedge after this latency
+GEMINI_HEDGE_BUDGET = float(os.getenv("GEMINI_HEDGE_BUDGET", "10"))  # max extra calls, % of requests
+GEMINI_HEDGE_MIN_DELAY = float(os.getenv("GEMINI_HEDGE_MIN_DELAY", "0.5"))
+GEMINI_HEDGE_MIN_SAMPLES = int(os.getenv("GEMINI_HEDGE_MIN_SAMPLES", "20"))  # before that, no hedging
+GEMINI_STREAM = os.getenv("GEMINI_STREAM", "0") == "1"
+LOAD_SHED_ENABLED = os.getenv("LOAD_SHED_ENABLED", "1") == "1"
+LOAD_SHED_HIGH_WATER = int(os.getenv("LOAD_SHED_HIGH_WATER", str(GEMINI_CONCURRENCY * 2)))  # running + queued
+
+
+class QueueTimeoutError(asyncio.TimeoutError):
+    """No model slot within the queue timeout - local congestion, not an upstream failure"""
+
+
+class GeminiPool:
+    """Key pool + concurrency cap + optional hedging + queue / model time metrics"""
+
+    def __init__(
+        self,
+        keys: KeyPool,
+        concurrency: int = GEMINI_CONCURRENCY,
+        timeout: float = GEMINI_TIMEOUT,
+        queue_timeout: float = GEMINI_QUEUE_TIMEOUT,
+        hedge: bool = GEMINI_HEDGE,
+        hedge_percentile: float = GEMINI_HEDGE_PERCENTILE,
+        hedge_budget: float = GEMINI_HEDGE_BUDGET,
+        stream: bool = GEMINI_STREAM,
+        high_water: int = LOAD_SHED_HIGH_WATER
+    ):
+        self.keys = keys
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.queue_timeout = queue_timeout
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.hedge_budget = hedge_budget
+        self.stream = stream
+        self.high_water = high_water
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self.breaker = CircuitBreaker()
+        self.adaptive_timeout = AdaptiveTimeout(maximum=timeout)
+
+        # Metrics
+        self.active = 0  # logical calls admitted and not finished (counted before any await)
+        self.waiting = 0
+        self.in_flight = 0
+        self.requests = 0  # generate() calls
+        self.calls = 0  # model calls, hedges included
+        self.timeouts = 0  # model calls past the timeout
+        self.queue_timeouts = 0  # gave up waiting for a slot
+        self.errors = 0
+        self.hedges_fired = 0
+        self.hedges_won = 0
+        self.hedges_skipped = 0  # over budget
+        self.shed = 0
+        self.quota_rejected = 0
+        self.peak_load = 0
+        self.streams = 0
+        self.streams_stopped_early = 0
+        self.first_chunk_times = deque(maxlen=500)  # stream start -> first chunk (seconds)
+        self.queue_times = deque(maxlen=500)  # waiting for a slot (seconds)
+        self.model_times = deque(maxlen=500)  # the model call itself (seconds)
+
+    def load(self) -> int:
+        """Model calls running + waiting for a slot (hedges included)"""
+        return max(self.active, self.in_flight + self.waiting)
+
+    def admit(self) -> bool:
+        """Load-shedding check before a model call; False = answer locally"""
+        if LOAD_SHED_ENABLED and self.load() >= self.high_water:
+            self.shed += 1
+            return False
+        return True
+
+    async def generate(self, prompt: str, timeout: float = None) -> str:
+        """Response text; the timeout covers model time, queueing is bounded by queue_timeout"""
+        return await self._guarded(
+            lambda timeout: self._hedged(prompt, timeout) if self.hedge else self._generate(prompt, timeout),
+            timeout
+        )
+
+    def hedge_delay(self):
+        """Rolling latency percentile of completed calls, None while there is too little data"""
+        if len(self.model_times) < GEMINI_HEDGE_MIN_SAMPLES:
+            return None
+        recent = sorted(self.model_times)
+        index = min(len(recent) - 1, int(len(recent) * self.hedge_percentile))
+        return max(GEMINI_HEDGE_MIN_DELAY, recent[index])
+
+    def _hedge_allowed(self) -> bool:
+        if self.hedges_fired < self.requests * self.hedge_budget / 100:
+            return True
+        self.hedges_skipped += 1
+        return False
+
+    async def _hedged(self, prompt: str, timeout: float) -> str:
+        """Primary call, plus a backup one if the primary is slower than hedge_delay()"""
+        primary = asyncio.create_task(self._generate(prompt, timeout))
+        tasks = {primary}
+        try:
+            delay = self.hedge_delay()
+            if delay is None:
+                return await primary
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if done or self.load() >= self.high_water or not self._hedge_allowed():
+                return await primary
+
+            self.hedges_fired += 1
+            tasks.add(asyncio.create_task(self._generate(prompt, timeout)))
+            while True:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                # A failed call only loses if the other one can still answer
+                answered = [task for task in done if task.exception() is None]
+                if answered or not tasks:
+                    winner = answered[0] if answered else done.pop()
+                    if answered and winner is not primary:
+                        self.hedges_won += 1
+                    return winner.result()
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def generate_stream(self, prompt: str, on_chunk, timeout: float = None):
+        """
+        Stream the response into on_chunk(text); once it returns True the stream
+        is closed (no more output tokens). Not hedged - one consumer per call.
+        """
+        await self._guarded(lambda timeout: self._stream(prompt, on_chunk, timeout), timeout)
+
+    async def _guarded(self, call, timeout: float = None):
+        """
+        Breaker check + verdict around one logical call (CircuitOpenError when open);
+        call(timeout) applies the model timeout once it holds a slot
+        """
+        if not self.breaker.allow():
+            raise CircuitOpenError("model circuit open")
+        self.requests += 1
+        self.active += 1
+        self.peak_load = max(self.peak_load, self.load())
+        timeout = timeout or self.adaptive_timeout.value()
+        ok = None
+        try:
+            result = await call(timeout)
+            ok = True
+            return result
+        except QueueTimeoutError:
+            # Never reached the model - no breaker verdict
+            self.queue_timeouts += 1
+            raise
+        except asyncio.TimeoutError:
+            ok = False
+            self.timeouts += 1
+            raise
+        except QuotaExhaustedError:
+            # Local budget, not an upstream failure - no breaker verdict
+            self.quota_rejected += 1
+            raise
+        except Exception:
+            ok = False
+            self.errors += 1
+            raise
+        finally:
+            self.active -= 1
+            self.breaker.record(ok)
+
+    @asynccontextmanager
+    async def _slot(self):
+        """One model call: waits for a semaphore slot, yields the start time, records model time"""
+        queued = time.perf_counter()
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            record_stage("gemini_queue", queued, time.perf_counter())
+            raise QueueTimeoutError(f"no model slot within {self.queue_timeout:g}s") from None
+        finally:
+            self.waiting -= 1
+        started = time.perf_counter()
+        self.queue_times.append(started - queued)
+        record_stage("gemini_queue", queued, started)
+
+        self.in_flight += 1
+        self.calls += 1
+        try:
+            yield started
+        except asyncio.CancelledError:
+            # Cancelled losers would drag the latency window down
+            raise
+        except asyncio.TimeoutError:
+            # Timed out on the model - the timeout it hit is its latency sample
+            self.adaptive_timeout.observe(self._model_done(started))
+            raise
+        except Exception:
+            self._model_done(started)
+            raise
+        else:
+            self.adaptive_timeout.observe(self._model_done(started))
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+
+    def _model_done(self, started: float) -> float:
+        end = time.perf_counter()
+        self.model_times.append(end - started)
+        record_stage("gemini_model", started, end)
+        return end - started
+
+    async def _generate(self, prompt: str, timeout: float) -> str:
+        async with self._slot():
+            response = await asyncio.wait_for(self._request(prompt), timeout=timeout)
+        return response.text
+
+    async def _request(self, prompt: str):
+        try:
+            with self.keys.use(prompt) as lease:
+                response = await lease.client.aio.models.generate_content(
+                    model=lease.model,
+                    contents=prompt
+                )
+        except Exception as e:
+            if not is_rate_limited(e):
+                raise
+            # That route is cooling down now - one retry on another one
+            with self.keys.use(prompt) as lease:
+                response = await lease.client.aio.models.generate_content(
+                    model=lease.model,
+                    contents=prompt
+                )
+        lease.settle(response)
+        return response
+
+    async def _stream(self, prompt: str, on_chunk, timeout: float):
+        async with self._slot() as started:
+            self.streams += 1
+            await asyncio.wait_for(self._read_stream(prompt, on_chunk, started), timeout=timeout)
+
+    async def _read_stream(self, prompt: str, on_chunk, started: float):
+        with self.keys.use(prompt) as lease:
+            stream = await lease.client.aio.models.generate_content_stream(
+                model=lease.model,
+                contents=prompt
+            )
+            last = None
+            try:
+                async for chunk in stream:
+                    if last is None:
+                        self.first_chunk_times.append(time.perf_counter() - started)
+                    last = chunk
+                    if on_chunk(chunk.text or ""):
+                        self.streams_stopped_early += 1
+                        break
+            finally:
+                await stream.aclose()
+            # Usage only arrives with the last chunk - early stops keep the estimate
+            lease.settle(last)
+
+    def shed_stats(self) -> dict:
+        return {
+            "enabled": LOAD_SHED_ENABLED,
+            "high_water": self.high_water,
+            "load": self.load(),
+            "peak_load": self.peak_load,
+            "shed": self.shed
+        }
+
+    def stats(self) -> dict:
+        delay = self.hedge_delay() if self.hedge else None
+        return {
+            "concurrency": self.concurrency,
+            "queue_timeout_s": self.queue_timeout,
+            "active": self.active,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "requests": self.requests,
+            "calls": self.calls,
+            "timeouts": self.timeouts,
+            "queue_timeouts": self.queue_timeouts,
+            "errors": self.errors,
+            "quota_rejected": self.quota_rejected,
+            "breaker": self.breaker.stats(),
+            "timeout": self.adaptive_timeout.stats(),
+            "hedging": {
+                "enabled": self.hedge,
+                "delay_ms": round(delay * 1000, 1) if delay is not None else None,
+                "budget_pct": self.hedge_budget,
+                "fired": self.hedges_fired,
+                "won": self.hedges_won,
+                "skipped_over_budget": self.hedges_skipped
+            },
+            "streaming": {
+                "enabled": self.stream,
+                "streams": self.streams,
+                "stopped_early": self.streams_stopped_early,
+                "first_chunk_ms": latency_summary(self.first_chunk_times)
+            },
+            "keys": self.keys.stats(),
+            "queue_ms": latency_summary(self.queue_times),
+            "model_ms": latency_summary(self.model_times)
+        }
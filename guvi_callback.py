@@ -0,0 +1,370 @@
+"""
+GUVI Callback Delivery - durable, off the request path
+Payloads are written to a SQLite outbox first (keyed by sessionId), then a
+background worker POSTs them over a pooled keep-alive HTTP client, retrying
+with exponential backoff + jitter. Whatever is still pending at shutdown is
+replayed on the next start, so a callback outage never loses intelligence.
+The outbox is opened in start(), not at import; in a container point
+CALLBACK_OUTBOX_PATH at a mounted volume or pending callbacks die with it.
+All outbox I/O runs on one dedicated thread - a locked database (another
+worker inside BEGIN IMMEDIATE) waits there, never on the event loop.
+"""
+
+import asyncio
+import json
+import os
+import random
+import sqlite3
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+from metrics import latency_summary
+from tracing import record_stage
+
+# ========================
+# Tuning
+# ========================
+CALLBACK_OUTBOX_PATH = os.getenv("CALLBACK_OUTBOX_PATH", "guvi_outbox.db")  # absolute, on a persistent volume
+CALLBACK_CONCURRENCY = int(os.getenv("CALLBACK_CONCURRENCY", "4"))  # POSTs in flight
+CALLBACK_BATCH_SIZE = int(os.getenv("CALLBACK_BATCH_SIZE", "1"))  # >1 POSTs a JSON array
+CALLBACK_TIMEOUT = float(os.getenv("CALLBACK_TIMEOUT", "10"))
+CALLBACK_POOL_SIZE = int(os.getenv("CALLBACK_POOL_SIZE", "10"))
+CALLBACK_DRAIN_SECONDS = float(os.getenv("CALLBACK_DRAIN_SECONDS", "5"))
+CALLBACK_MAX_ATTEMPTS = int(os.getenv("CALLBACK_MAX_ATTEMPTS", "12"))
+CALLBACK_BACKOFF_BASE = float(os.getenv("CALLBACK_BACKOFF_BASE", "2"))
+CALLBACK_BACKOFF_MAX = float(os.getenv("CALLBACK_BACKOFF_MAX", "600"))
+CALLBACK_POLL_SECONDS = float(os.getenv("CALLBACK_POLL_SECONDS", "5"))
+
+# Client errors that will never succeed on retry (everything else is retried)
+RETRYABLE_STATUS = {408, 425, 429}
+
+
+def backoff_delay(attempts: int, base: float = CALLBACK_BACKOFF_BASE, cap: float = CALLBACK_BACKOFF_MAX) -> float:
+    """Exponential backoff with full jitter - failed callbacks don't retry in lockstep"""
+    return random.uniform(0, min(cap, base * (2 ** attempts)))
+
+
+# ========================
+# 1. OUTBOX (SQLite, shared by all workers on the box)
+# ========================
+class CallbackOutbox:
+    """
+    One row per sessionId - re-submitting a session replaces its payload, so
+    delivery is idempotent. next_attempt doubles as a lease: claimed rows are
+    pushed into the future, so another process won't send them concurrently
+    and a crashed sender's rows come back on their own.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS outbox (
+        session_id TEXT PRIMARY KEY,
+        payload TEXT NOT NULL,
+        status TEXT NOT NULL DEFAULT 'pending',
+        attempts INTEGER NOT NULL DEFAULT 0,
+        next_attempt REAL NOT NULL,
+        created REAL NOT NULL,
+        last_error TEXT
+    );
+    CREATE INDEX IF NOT EXISTS outbox_due ON outbox (status, next_attempt);
+    """
+
+    def __init__(self, path: str = CALLBACK_OUTBOX_PATH):
+        self.path = path
+        self.db = sqlite3.connect(path, timeout=10, isolation_level=None, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(self.SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def put(self, session_id: str, payload: dict):
+        now = time.time()
+        self.db.execute(
+            "INSERT OR REPLACE INTO outbox (session_id, payload, status, attempts, next_attempt, created) "
+            "VALUES (?, ?, 'pending', 0, ?, ?)",
+            (session_id, json.dumps(payload), now, now)
+        )
+
+    def claim_due(self, limit: int, lease_seconds: float) -> list:
+        """Take up to `limit` due rows -> [(session_id, payload, attempts)]"""
+        now = time.time()
+        with self.db:
+            self.db.execute("BEGIN IMMEDIATE")
+            rows = self.db.execute(
+                "SELECT session_id, payload, attempts FROM outbox "
+                "WHERE status = 'pending' AND next_attempt <= ? ORDER BY next_attempt LIMIT ?",
+                (now, limit)
+            ).fetchall()
+            self.db.executemany(
+                "UPDATE outbox SET next_attempt = ? WHERE session_id = ?",
+                [(now + lease_seconds, row[0]) for row in rows]
+            )
+        return [(session_id, json.loads(payload), attempts) for session_id, payload, attempts in rows]
+
+    def delivered(self, session_ids: list):
+        self.db.executemany("DELETE FROM outbox WHERE session_id = ?", [(sid,) for sid in session_ids])
+
+    def retry(self, session_id: str, attempts: int, delay: float, error: str):
+        self.db.execute(
+            "UPDATE outbox SET attempts = ?, next_attempt = ?, last_error = ? WHERE session_id = ?",
+            (attempts, time.time() + delay, error, session_id)
+        )
+
+    def dead(self, session_id: str, attempts: int, error: str):
+        """Give up on a payload but keep it for inspection / manual replay"""
+        self.db.execute(
+            "UPDATE outbox SET status = 'dead', attempts = ?, last_error = ? WHERE session_id = ?",
+            (attempts, error, session_id)
+        )
+
+    def requeue_dead(self) -> int:
+        return self.db.execute(
+            "UPDATE outbox SET status = 'pending', attempts = 0, next_attempt = ? WHERE status = 'dead'",
+            (time.time(),)
+        ).rowcount
+
+    def next_due_in(self):
+        """Seconds until the next pending row is due, None if nothing pending"""
+        row = self.db.execute("SELECT MIN(next_attempt) FROM outbox WHERE status = 'pending'").fetchone()
+        return None if row[0] is None else max(0.0, row[0] - time.time())
+
+    def counts(self) -> dict:
+        counts = {"pending": 0, "dead": 0}
+        for status, count in self.db.execute("SELECT status, COUNT(*) FROM outbox GROUP BY status"):
+            counts[status] = count
+        return counts
+
+
+# ========================
+# 2. DISPATCHER (background worker + pooled client)
+# ========================
+class CallbackDispatcher:
+    """Outbox + one delivery loop + one shared HTTP client"""
+
+    def __init__(
+        self,
+        url: str,
+        outbox: CallbackOutbox = None,
+        path: str = CALLBACK_OUTBOX_PATH,
+        concurrency: int = CALLBACK_CONCURRENCY,
+        batch_size: int = CALLBACK_BATCH_SIZE,
+        timeout: float = CALLBACK_TIMEOUT,
+        pool_size: int = CALLBACK_POOL_SIZE,
+        max_attempts: int = CALLBACK_MAX_ATTEMPTS
+    ):
+        self.url = url
+        self.path = path
+        self.outbox = outbox  # opened in start() unless one is passed in
+        self._owns_outbox = outbox is None
+        self.concurrency = concurrency
+        self.batch_size = max(1, batch_size)
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.max_attempts = max_attempts
+        self.client = None
+        self._task = None
+        self._wake = asyncio.Event()
+        self._in_flight = 0
+        self._loop = None
+        self._io = ThreadPoolExecutor(max_workers=1, thread_name_prefix="guvi-outbox")
+        self._unwritten = deque()  # payloads whose put failed, retried on the outbox thread
+        self._counts = {"pending": 0, "dead": 0}  # as of the last delivery pass
+
+        # Metrics
+        self.enqueued = 0
+        self.delivered = 0
+        self.failed = 0  # failed attempts (each retry counts)
+        self.retried = 0
+        self.dead = 0
+        self.replayed = 0
+        self.latencies = deque(maxlen=200)  # recent POST times (seconds)
+
+    async def _call(self, fn, *args):
+        """Blocking outbox call on the outbox thread"""
+        return await asyncio.get_running_loop().run_in_executor(self._io, fn, *args)
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        if self.outbox is None:
+            if not os.path.isabs(self.path):
+                print(
+                    f"⚠️ GUVI OUTBOX: relative path {self.path} - set CALLBACK_OUTBOX_PATH to an "
+                    "absolute path on a mounted volume to keep pending callbacks across restarts"
+                )
+            self.outbox = await self._call(CallbackOutbox, self.path)
+        self.client = httpx.AsyncClient(
+            timeout=self.timeout,
+            limits=httpx.Limits(
+                max_connections=self.pool_size,
+                max_keepalive_connections=self.pool_size
+            )
+        )
+        self._counts = await self._call(self.outbox.counts)
+        self.replayed = self._counts["pending"]
+        if self.replayed:
+            print(f"🔁 GUVI CALLBACK: replaying {self.replayed} pending callbacks from outbox")
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self, drain_seconds: float = CALLBACK_DRAIN_SECONDS):
+        """Give due callbacks a moment to go out - the rest stay in the outbox"""
+        deadline = time.monotonic() + drain_seconds
+        while self.outbox is not None and time.monotonic() < deadline \
+                and (self._in_flight or await self._call(self.outbox.next_due_in) == 0):
+            await asyncio.sleep(0.05)
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+        if self.outbox is None:
+            return
+        try:
+            await self._call(self._flush_unwritten)
+        except Exception as e:
+            print(f"❌ GUVI OUTBOX ERROR: {e}")
+        pending = (await self._call(self.outbox.counts))["pending"]
+        if pending:
+            print(f"⚠️ GUVI CALLBACK: {pending} callbacks left in outbox for next start")
+        if self._unwritten:
+            print(f"❌ GUVI OUTBOX ERROR: {len(self._unwritten)} callbacks could not be written, lost")
+        if self._owns_outbox:
+            await self._call(self.outbox.close)
+            self.outbox = None
+
+    def submit(self, payload: dict) -> bool:
+        """
+        Hand a payload to the outbox thread, which records it and wakes the worker
+        (never blocks the loop; a failed write is kept and retried on every pass)
+        """
+        if self.outbox is None:
+            print(f"❌ GUVI OUTBOX ERROR: not open (dispatcher not started) - {payload['sessionId']}")
+            return False
+        self._io.submit(self._write, payload)
+        self.enqueued += 1
+        return True
+
+    def _write(self, payload: dict):
+        """On the outbox thread"""
+        try:
+            self.outbox.put(payload["sessionId"], payload)
+        except Exception as e:
+            print(f"❌ GUVI OUTBOX ERROR: {payload['sessionId']} kept for retry - {e}")
+            self._unwritten.append(payload)
+            return
+        self._loop.call_soon_threadsafe(self._wake.set)
+
+    def _flush_unwritten(self):
+        """On the outbox thread: retry failed writes in order, stop at the first failure"""
+        while self._unwritten:
+            payload = self._unwritten[0]
+            self.outbox.put(payload["sessionId"], payload)
+            self._unwritten.popleft()
+
+    def _claim(self, limit: int, lease: float):
+        """On the outbox thread: one delivery pass -> (due rows, seconds until the next one)"""
+        try:
+            self._flush_unwritten()
+        except Exception as e:
+            print(f"❌ GUVI OUTBOX ERROR: {len(self._unwritten)} callbacks still unwritten - {e}")
+        due = self.outbox.claim_due(limit, lease)
+        self._counts = self.outbox.counts()
+        return due, None if due else self.outbox.next_due_in()
+
+    async def _settle(self, fn, *args):
+        """Record a delivery outcome; on failure the row's lease runs out and it is sent again"""
+        try:
+            await self._call(fn, *args)
+        except Exception as e:
+            print(f"❌ GUVI OUTBOX ERROR: {e}")
+
+    async def _run(self):
+        lease = self.timeout * 2 + 5
+        while True:
+            try:
+                due, wait = await self._call(self._claim, self.concurrency * self.batch_size, lease)
+            except Exception as e:
+                print(f"❌ GUVI OUTBOX ERROR: {e}")
+                due, wait = [], None
+
+            if not due:
+                self._wake.clear()
+                wait = CALLBACK_POLL_SECONDS if wait is None else min(wait, CALLBACK_POLL_SECONDS)
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=wait)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            batches = [due[i:i + self.batch_size] for i in range(0, len(due), self.batch_size)]
+            await asyncio.gather(*(self._send(batch) for batch in batches))
+
+    async def _send(self, batch: list):
+        """POST one payload (or a JSON array of them) and record the outcome"""
+        session_ids = [session_id for session_id, _, _ in batch]
+        if len(batch) == 1:
+            body = batch[0][1]
+            headers = {"Idempotency-Key": session_ids[0]}
+        else:
+            body = [payload for _, payload, _ in batch]
+            headers = {}
+
+        self._in_flight += 1
+        start = time.perf_counter()
+        error, retryable = None, True
+        try:
+            r = await self.client.post(self.url, json=body, headers=headers)
+            if r.is_success:
+                print(f"✅ GUVI CALLBACK: {r.status_code} - Sessions: {', '.join(session_ids)}")
+            else:
+                error = f"HTTP {r.status_code}"
+                retryable = r.status_code >= 500 or r.status_code in RETRYABLE_STATUS
+                print(f"⚠️ GUVI CALLBACK: {r.status_code} - Sessions: {', '.join(session_ids)}")
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            print(f"❌ GUVI CALLBACK ERROR: {error}")
+        finally:
+            self._in_flight -= 1
+            end = time.perf_counter()
+            self.latencies.append(end - start)
+            record_stage("guvi_post", start, end)
+
+        if error is None:
+            self.delivered += len(batch)
+            await self._settle(self.outbox.delivered, session_ids)
+            return
+
+        self.failed += len(batch)
+        for session_id, _, attempts in batch:
+            attempts += 1
+            if retryable and attempts < self.max_attempts:
+                self.retried += 1
+                await self._settle(self.outbox.retry, session_id, attempts, backoff_delay(attempts), error)
+            else:
+                self.dead += 1
+                await self._settle(self.outbox.dead, session_id, attempts, error)
+                print(f"❌ GUVI CALLBACK GAVE UP: {session_id} after {attempts} attempts ({error})")
+
+    def stats(self) -> dict:
+        """No I/O: outbox counts as of the last delivery pass"""
+        counts = self._counts
+        return {
+            "queue_depth": counts["pending"],
+            "dead_letters": counts["dead"],
+            "unwritten": len(self._unwritten),
+            "in_flight": self._in_flight,
+            "enqueued": self.enqueued,
+            "delivered": self.delivered,
+            "failed": self.failed,
+            "retried": self.retried,
+            "gave_up": self.dead,
+            "replayed_on_start": self.replayed,
+            "latency_ms": {
+                "last": round(self.latencies[-1] * 1000, 1) if self.latencies else None,
+                **latency_summary(self.latencies)
+            }
+        }
@@ -0,0 +1,102 @@
+"""
+Idempotency - retried /honeypot POSTs must not run a turn twice
+A retry that arrives while the original is still running awaits the same
+result (the turn runs in its own task, so a dropped original connection
+doesn't cancel it); a retry after completion is answered from a short-lived
+response cache. Keyed by an Idempotency-Key header, else by a hash of
+sessionId + message text + timestamp.
+"""
+
+import asyncio
+import hashlib
+import os
+import time
+from collections import OrderedDict
+
+# ========================
+# Tuning
+# ========================
+IDEMPOTENCY_ENABLED = os.getenv("IDEMPOTENCY_ENABLED", "1") == "1"
+IDEMPOTENCY_TTL_SECONDS = float(os.getenv("IDEMPOTENCY_TTL_SECONDS", "300"))
+IDEMPOTENCY_CACHE_SIZE = int(os.getenv("IDEMPOTENCY_CACHE_SIZE", "10000"))
+
+
+def request_key(session_id: str, text: str, timestamp, header_key: str = None):
+    """Idempotency key of one turn, None when the request can't be told apart from a repeat"""
+    if header_key:
+        return f"{session_id}\x00{header_key}"
+    if timestamp is None:
+        # Scammers repeat lines on purpose - without a timestamp that's a new turn
+        return None
+    raw = f"{session_id}\x00{text}\x00{timestamp}".encode("utf-8", "surrogatepass")
+    return hashlib.sha256(raw).hexdigest()
+
+
+class IdempotencyCache:
+    """In-flight tasks + TTL/LRU cache of completed responses"""
+
+    def __init__(
+        self,
+        ttl_seconds: float = IDEMPOTENCY_TTL_SECONDS,
+        max_entries: int = IDEMPOTENCY_CACHE_SIZE,
+        enabled: bool = IDEMPOTENCY_ENABLED,
+        clock=time.monotonic
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self.clock = clock
+        self._in_flight = {}  # key -> asyncio.Task
+        self._done = OrderedDict()  # key -> (expires, response)
+
+        # Metrics
+        self.executed = 0
+        self.replayed = 0
+        self.coalesced = 0
+
+    async def run(self, key, turn):
+        """
+        (response, replayed) - turn() is only called for the first request
+        with this key; failures are not cached, so a later retry runs again
+        """
+        if not self.enabled or key is None:
+            return await turn(), False
+
+        cached = self._done.get(key)
+        if cached is not None:
+            if cached[0] > self.clock():
+                self.replayed += 1
+                return cached[1], True
+            del self._done[key]
+
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.coalesced += 1
+            return await asyncio.shield(task), True
+
+        self.executed += 1
+        task = asyncio.ensure_future(turn())
+        self._in_flight[key] = task
+        task.add_done_callback(lambda t: self._finish(key, t))
+        return await asyncio.shield(task), False
+
+    def _finish(self, key, task: asyncio.Task):
+        self._in_flight.pop(key, None)
+        if task.cancelled() or task.exception() is not None:
+            return
+        now = self.clock()
+        self._done[key] = (now + self.ttl_seconds, task.result())
+        self._done.move_to_end(key)
+        # Same TTL for all, so the oldest entries expire first
+        while self._done and (len(self._done) > self.max_entries or next(iter(self._done.values()))[0] <= now):
+            self._done.popitem(last=False)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "in_flight": len(self._in_flight),
+            "cached": len(self._done),
+            "executed": self.executed,
+            "replayed": self.replayed,
+            "coalesced": self.coalesced
+        }
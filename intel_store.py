@@ -0,0 +1,143 @@
+"""
+Intel Store - ordered, deduplicated, capped intelligence buckets
+Replaces list(set(a + b)) merging: O(1) membership, first-seen order kept
+"""
+
+import os
+import sys
+
+# ========================
+# Field Layout & Caps
+# ========================
+INTEL_FIELDS = (
+    "upiIds",
+    "bankAccounts",
+    "phoneNumbers",
+    "phishingLinks",
+    "emailAddresses",
+    "scammerNames",
+    "pincodes",
+    "ifscCodes",
+    "rawMessages"
+)
+
+INTEL_FIELD_CAP = int(os.getenv("INTEL_FIELD_CAP", "50"))
+INTEL_FIELD_CAPS = {
+    "rawMessages": int(os.getenv("INTEL_RAW_MESSAGES_CAP", "20"))
+}
+KEYWORD_CAP = int(os.getenv("KEYWORD_CAP", "100"))
+
+
+class OrderedSet:
+    """Insertion-ordered set, values past the cap are dropped (first seen wins)"""
+
+    __slots__ = ("_items", "cap")
+
+    def __init__(self, values=(), cap: int = None):
+        self._items = {}
+        self.cap = cap
+        if values:
+            self.update(values)
+
+    def add(self, value) -> bool:
+        """Add one value, True if it was new and kept"""
+        if value in self._items:
+            return False
+        if self.cap is not None and len(self._items) >= self.cap:
+            return False
+        self._items[value] = None
+        return True
+
+    def update(self, values) -> list:
+        """Add many values, returns the ones that were new"""
+        return [value for value in values if self.add(value)]
+
+    def to_list(self) -> list:
+        return list(self._items)
+
+    def last(self):
+        return next(reversed(self._items)) if self._items else None
+
+    def footprint(self) -> int:
+        """Approximate bytes held: the set, its dict and the values"""
+        return sys.getsizeof(self) + sys.getsizeof(self._items) + sum(map(sys.getsizeof, self._items))
+
+    def __contains__(self, value):
+        return value in self._items
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def __len__(self):
+        return len(self._items)
+
+    def __repr__(self):
+        return f"OrderedSet({self.to_list()!r})"
+
+
+class IntelStore:
+    """All intel buckets of one session (or one turn) - buckets are created on first use"""
+
+    __slots__ = ("_fields",)
+
+    def __init__(self):
+        self._fields = {}
+
+    def _bucket(self, field: str) -> OrderedSet:
+        bucket = self._fields.get(field)
+        if bucket is None:
+            if field not in INTEL_FIELDS:
+                raise KeyError(field)
+            bucket = self._fields[field] = OrderedSet(cap=INTEL_FIELD_CAPS.get(field, INTEL_FIELD_CAP))
+        return bucket
+
+    def add(self, field: str, value) -> bool:
+        return self._bucket(field).add(value)
+
+    def latest(self, field: str):
+        """Most recently added value of a field, None if empty"""
+        bucket = self._fields.get(field)
+        if not bucket:
+            return None
+        return bucket.last()
+
+    def merge(self, other: "IntelStore") -> dict:
+        """Fold another store in, returns {field: [new values]} for fields that grew"""
+        added = {}
+        for field, values in other._fields.items():
+            new = self._bucket(field).update(values)
+            if new:
+                added[field] = new
+        return added
+
+    def count(self, field: str) -> int:
+        """Values held for a field (never creates its bucket)"""
+        bucket = self._fields.get(field)
+        return len(bucket) if bucket is not None else 0
+
+    def footprint(self) -> dict:
+        """Approximate bytes per non-empty field (buckets not yet created cost nothing)"""
+        return {field: bucket.footprint() for field, bucket in self._fields.items()}
+
+    def to_dict(self) -> dict:
+        """JSON shape used in responses and the GUVI payload"""
+        fields = self._fields
+        return {
+            field: fields[field].to_list() if field in fields else []
+            for field in INTEL_FIELDS
+        }
+
+    def __getitem__(self, field: str) -> OrderedSet:
+        """Read access - a missing field gives a detached empty set (write through add())"""
+        bucket = self._fields.get(field)
+        if bucket is None:
+            if field not in INTEL_FIELDS:
+                raise KeyError(field)
+            return OrderedSet(cap=INTEL_FIELD_CAPS.get(field, INTEL_FIELD_CAP))
+        return bucket
+
+    def __iter__(self):
+        return iter(INTEL_FIELDS)
+
+    def __repr__(self):
+        return f"IntelStore({self.to_dict()!r})"
@@ -0,0 +1,211 @@
+"""
+Local Replies - offline persona replies from templates, no model call
+Driven by the same inputs as the Gemini persona (scam type, language style,
+user region, stage) and fills slots from the session's intel, e.g. echoing
+a UPI ID back "to confirm". Used when the model is unavailable (breaker
+open, errors), when shedding load, and optionally for early turns.
+"""
+
+import os
+import random
+import re
+import string
+
+# ========================
+# Tuning
+# ========================
+LOCAL_REPLY_TURNS = int(os.getenv("LOCAL_REPLY_TURNS", "0"))  # turns <= N answered locally (0 = never)
+LOCAL_ECHO_RATE = float(os.getenv("LOCAL_ECHO_RATE", "0.6"))  # chance to echo intel when a slot fits
+
+# ========================
+# 1. TEMPLATE TABLES
+# ========================
+# Short regional openers (same phrases as get_regional_style_guide)
+REGION_OPENERS = {
+    "bengali": ["Accha okay,", "Bujhlam na,", "Emon keno?", "Ki korbo ekhon?"],
+    "tamil": ["Enna sir, puriyala.", "Seri seri,", "Sollunga sir,", "Nalla confusion-ah irukku."],
+    "telugu": ["Enti sir, artham kaale.", "Sare,", "Enti ippudu?", "Chepandi clearly,"],
+    "kannada": ["Yenu sir, gottagilla.", "Heli properly,", "Yenu maadbekku?"],
+    "malayalam": ["Enthu sir, manassilayilla.", "Parayoo clearly,", "Enthu cheyyum?"],
+    "north_indian": ["Acha okay,", "Haan ji,", "Theek hai sir,", "Kya karu ab?"]
+}
+
+HINDI_OPENERS = ["जी,", "अच्छा,", "हाँ जी,", "रुकिए,"]
+
+# What the scam is about, per language style
+SCAM_TOPICS = {
+    "bank_fraud": {"english": "my bank account", "hinglish": "account", "hindi": "खाते"},
+    "upi_scam": {"english": "my UPI", "hinglish": "UPI", "hindi": "UPI"},
+    "prize_scam": {"english": "the prize", "hinglish": "prize", "hindi": "इनाम"},
+    "verification_scam": {"english": "the verification", "hinglish": "verification", "hindi": "वेरिफिकेशन"}
+}
+
+# language -> stage -> templates; {opener} {topic} always available,
+# {upi} {phone} {account} {link} {email} only when the session has that intel
+TEMPLATES = {
+    "english": {
+        "initial": [
+            "{opener} what happened to {topic}?",
+            "I don't understand. What is the problem with {topic}?",
+            "Wait, who is this? What is wrong with {topic}?"
+        ],
+        "building_trust": [
+            "{opener} I want to fix this. Which office are you calling from?",
+            "Okay, what exactly should I do for {topic}? Tell me step by step.",
+            "What is your name sir? Let me note it down."
+        ],
+        "extracting": [
+            "{opener} I am ready to do it. Can you tell your UPI ID again?",
+            "Please repeat the account number, I am writing it down to verify.",
+            "What is your direct number? If the call drops I will call back.",
+            "Is it UPI ID {upi}? Please confirm once.",
+            "Should I call you on {phone}? Confirm the number please.",
+            "Account {account}, correct? What name will show there?",
+            "The link {link} is not opening for me. Can you send another?"
+        ],
+        "final": [
+            "{opener} the payment keeps failing. Do you have another UPI ID?",
+            "The link is not opening. Is there any other way to do this?",
+            "My app is showing an error. Do you have another account or number?",
+            "Payment to {upi} is failing. Can you give another UPI ID?",
+            "Your number {phone} is not reachable. Any other number?",
+            "Bank says account {account} is not valid. Any other account?"
+        ]
+    },
+    "hinglish": {
+        "initial": [
+            "{opener} mere {topic} ke saath kya hua?",
+            "{opener} samajh nahi aaya, {topic} mein problem kya hai?",
+            "Ruko ruko, {topic} ka kya issue hai? Aap kaun bol rahe ho?"
+        ],
+        "building_trust": [
+            "{opener} main help karunga. Aap kaunse office se ho?",
+            "Acha, {topic} ke liye mujhe kya karna padega? Step by step batao.",
+            "{opener} aapka naam kya hai? Main note kar leta hoon."
+        ],
+        "extracting": [
+            "{opener} main ready hoon, aapka UPI ID phir se batao?",
+            "Account number dobara bolo na, main verify karke likh raha hoon.",
+            "Aapka direct number kya hai? Call cut hua toh main wapas karunga.",
+            "UPI ID {upi} hi hai na? Ek baar confirm karo.",
+            "Number {phone} pe hi call karun? Confirm karo please.",
+            "Account {account} hi hai na? Naam kya aayega wahan?",
+            "Ye link {link} khul nahi raha, dusra bhejo?"
+        ],
+        "final": [
+            "{opener} payment fail ho raha hai, koi aur UPI hai kya?",
+            "Link khul nahi raha, koi dusra tareeka batao?",
+            "App error dikha raha hai. Aapka dusra number ya account hai?",
+            "{upi} pe payment fail ho raha hai, dusra UPI do na?",
+            "{phone} lag nahi raha, koi aur number hai?",
+            "Bank bol raha hai account {account} galat hai, dusra account do?"
+        ]
+    },
+    "hindi": {
+        "initial": [
+            "{opener} मेरे {topic} के साथ क्या हुआ?",
+            "{opener} समझ नहीं आया, {topic} में क्या दिक्कत है?"
+        ],
+        "building_trust": [
+            "{opener} मैं मदद करूँगा। आप किस ऑफिस से बोल रहे हैं?",
+            "{topic} के लिए मुझे क्या करना होगा? आराम से बताइए।"
+        ],
+        "extracting": [
+            "{opener} मैं तैयार हूँ, अपना UPI ID फिर से बताइए?",
+            "अपना नंबर बताइए, कॉल कट गई तो मैं वापस करूँगा।",
+            "UPI ID {upi} ही है ना? एक बार पक्का कीजिए।",
+            "नंबर {phone} पर ही कॉल करूँ?"
+        ],
+        "final": [
+            "{opener} पेमेंट नहीं हो रहा, कोई और UPI है क्या?",
+            "यह लिंक काम नहीं कर रहा। कोई और तरीका बताइए?",
+            "{upi} पर पेमेंट फेल हो रहा है, दूसरा UPI दीजिए?"
+        ]
+    }
+}
+
+# Slot name -> IntelStore field
+SLOT_FIELDS = {
+    "upi": "upiIds",
+    "phone": "phoneNumbers",
+    "account": "bankAccounts",
+    "link": "phishingLinks",
+    "email": "emailAddresses"
+}
+
+_FORMATTER = string.Formatter()
+_SENTENCE_START_RE = re.compile(r"(?<=[.?!] )[a-z]")
+
+
+def _compile(templates: dict) -> dict:
+    """language -> stage -> ([plain templates], {slot: [echo templates]})"""
+    compiled = {}
+    for language, stages in templates.items():
+        for stage, lines in stages.items():
+            plain, echo = [], {}
+            for line in lines:
+                slots = [name for _, name, _, _ in _FORMATTER.parse(line) if name in SLOT_FIELDS]
+                if slots:
+                    echo.setdefault(slots[0], []).append(line)
+                else:
+                    plain.append(line)
+            compiled[(language, stage)] = (plain, echo)
+    return compiled
+
+
+# ========================
+# 2. ENGINE
+# ========================
+class LocalReplyEngine:
+    """Template persona replies in microseconds - never calls the model"""
+
+    def __init__(self, templates: dict = TEMPLATES, echo_rate: float = LOCAL_ECHO_RATE, rng=random):
+        self._templates = _compile(templates)
+        self._languages = set(templates)
+        self.echo_rate = echo_rate
+        self.rng = rng
+
+        # Metrics (by reason: fallback / shed / early_turn ...)
+        self.served = {}
+
+    def reply(
+        self,
+        scam_type: str,
+        language_style: str,
+        user_region: str,
+        stage: str,
+        intel=None,
+        reason: str = "fallback"
+    ) -> str:
+        self.served[reason] = self.served.get(reason, 0) + 1
+        rng = self.rng
+        language = language_style if language_style in self._languages else "hinglish"
+        plain, echo = self._templates[(language, stage)]
+
+        slots = {}
+        if intel is not None and echo and rng.random() < self.echo_rate:
+            for slot in echo:
+                value = intel.latest(SLOT_FIELDS[slot])
+                if value is not None:
+                    slots[slot] = value
+        if slots:
+            slot = rng.choice(list(slots))
+            template = rng.choice(echo[slot])
+        else:
+            template = rng.choice(plain)
+
+        if language == "hindi":
+            opener = rng.choice(HINDI_OPENERS)
+        else:
+            opener = rng.choice(REGION_OPENERS.get(user_region, REGION_OPENERS["north_indian"]))
+        topic = SCAM_TOPICS.get(scam_type, SCAM_TOPICS["bank_fraud"])[language]
+
+        # Openers may end a sentence ("Emon keno?") - capitalize what follows
+        text = template.format(opener=opener, topic=topic, **slots)
+        return _SENTENCE_START_RE.sub(lambda m: m.group().upper(), text)
+
+    def stats(self) -> dict:
+        return {
+            "served": dict(self.served),
+            "early_turns": LOCAL_REPLY_TURNS
+        }
@@ -3,80 +3,294 @@ Enhanced Agentic Honeypot - India AI Impact Buildathon 2026
 All Winning Features Integrated
 """
 
-from fastapi import FastAPI, Request, HTTPException
+from fastapi import FastAPI, Request, Response, HTTPException
+from fastapi.responses import StreamingResponse, PlainTextResponse
 from google import genai
+import hmac
 import os
 import re
-import requests
+import sys
 import random
 import asyncio
+import json
 import time
+from contextlib import asynccontextmanager
 from datetime import datetime
+from intel_store import IntelStore
+from session_store import (
+    open_session_store, SessionLocks, SESSION_SWEEP_SECONDS, message_mark, unseen_messages
+)
+from session_state import SessionState
+from guvi_callback import CallbackDispatcher
+from gemini_pool import GeminiPool
+from gemini_keys import KeyPool, QuotaExhaustedError
+from circuit_breaker import CircuitOpenError
+from local_replies import LocalReplyEngine, LOCAL_REPLY_TURNS
+from idempotency import IdempotencyCache, request_key
+from reply_cache import ReplyCache
+from reply_pipeline import ReplyPipeline
+from tracing import Tracer, record_stage
+from profiler import RequestProfiler
+from memory_report import AllocationTracker, session_report, MEMORY_TOP
+from metrics import REGISTRY, REQUEST_SECONDS, SCAMS_DETECTED, Sampled, CONTENT_TYPE
 
-app = FastAPI(title="Enhanced Scam Honeypot")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start / stop background workers (defined further below)"""
+    await callbacks.start()
+    tracer.start()
+    tasks = [asyncio.create_task(sweep_sessions_forever())]
+    yield
+    for task in tasks:
+        task.cancel()
+    profiler.stop("shutdown")
+    await callbacks.stop()
+    tracer.stop()
+
+app = FastAPI(title="Enhanced Scam Honeypot", lifespan=lifespan)
 
 # ========================
 # Environment Keys
 # ========================
 API_KEY = os.getenv("API_KEY", "test@123")
-GEMINI_KEY = os.getenv("GEMINI_API_KEY")
-if not GEMINI_KEY:
+ADMIN_API_KEY = os.getenv("ADMIN_API_KEY", "")  # unset = /admin/* disabled
+# One key in GEMINI_API_KEY, or several comma-separated in GEMINI_API_KEYS
+GEMINI_KEYS = [k.strip() for k in os.getenv("GEMINI_API_KEYS", os.getenv("GEMINI_API_KEY", "")).split(",") if k.strip()]
+if not GEMINI_KEYS:
     raise RuntimeError("GEMINI_API_KEY not set")
 
 # ========================
 # Gemini Client Setup
 # ========================
-client = genai.Client(api_key=GEMINI_KEY)
 MODEL_NAME = "gemini-3-flash-preview"
+GEMINI_MODELS = [m.strip() for m in os.getenv("GEMINI_MODELS", MODEL_NAME).split(",") if m.strip()]
+
+# Every key x model pair is a route with its own budget - see gemini_keys.py
+gemini_keys = KeyPool(GEMINI_KEYS, GEMINI_MODELS, lambda key: genai.Client(api_key=key))
+
+# Async calls capped at GEMINI_CONCURRENCY, timeout GEMINI_TIMEOUT - see gemini_pool.py
+gemini = GeminiPool(gemini_keys)
+
+# Replies to repeated scam scripts - see reply_cache.py
+reply_cache = ReplyCache()
+
+# Template persona replies (fallbacks / early turns) - see local_replies.py
+local_replies = LocalReplyEngine()
 
 # ========================
 # Memory & Session Data
 # ========================
-sessions = {}  # Conversation history
-session_meta = {}  # Intelligence & metadata
+# sessionId -> meta (intelligence, metadata and "history")
+# Backend picked by SESSION_BACKEND (memory / sqlite / redis)
+# Bounded by SESSION_MAX / SESSION_TTL_SECONDS, see finalize_session for eviction
+store = open_session_store(on_evict=lambda sid, meta, reason: finalize_session(sid, meta))
+session_locks = SessionLocks()
+
+# Retried POSTs share one turn (in flight) or replay its response (done)
+idempotency = IdempotencyCache()
+
+# ========================
+# 0. KEYWORD TABLES & SINGLE-PASS MATCHER
+# ========================
+# Region indicators - order matters, specific regions are checked first
+REGION_KEYWORDS = {
+    "bengali": ['bhalo', 'accha', 'bujhlam', 'ki', 'keno', 'emon', 'korbo', 'bolchi'],
+    "tamil": ['enna', 'puriyala', 'seri', 'sollunga', 'nalla', 'ponga'],
+    "telugu": ['enti', 'artham', 'kaale', 'chepandi', 'ela', 'sare'],
+    "kannada": ['yenu', 'gottagilla', 'heli', 'chennagi', 'illa'],
+    "malayalam": ['enthu', 'manassilayilla', 'parayoo', 'nannaayi', 'alle'],
+    # Hindi/Hinglish (North India - most common)
+    "north_indian": ['aap', 'kya', 'kaise', 'karo', 'theek', 'haan', 'nahi'],
+}
+
+# Hindi/Hinglish indicators + regional words that also indicate non-English
+LANGUAGE_KEYWORDS = [
+    'aap', 'hai', 'karo', 'jaldi', 'turant', 'nahi', 'haan',
+    'kya', 'kaise', 'kyun', 'bhai', 'sir', 'madam', 'ji',
+    'acha', 'theek', 'please', 'matlab', 'samajh', 'batao',
+    'bhalo', 'bujhlam', 'enna', 'puriyala', 'seri',
+    'enti', 'artham', 'yenu', 'gottagilla', 'enthu'
+]
+
+# Weighted scoring system
+SCAM_PATTERNS = {
+    'urgency': {
+        'keywords': ['urgent', 'immediately', 'now', 'today', 'turant', 'jaldi', 'within', 'asap'],
+        'weight': 25
+    },
+    'threats': {
+        'keywords': ['block', 'blocked', 'suspend', 'close', 'legal', 'arrest', 'police', 'court', 'penalty', 'action'],
+        'weight': 30
+    },
+    'financial': {
+        'keywords': ['bank', 'account', 'upi', 'payment', 'transfer', 'credit', 'debit', 'card', 'money'],
+        'weight': 20
+    },
+    'verification': {
+        'keywords': ['verify', 'confirm', 'update', 'validate', 'share', 'provide', 'send', 'otp'],
+        'weight': 20
+    },
+    'impersonation': {
+        'keywords': ['rbi', 'reserve bank', 'government', 'police', 'officer', 'department', 'ministry', 'official'],
+        'weight': 25
+    }
+}
+
+# Scam type indicators - order matters, first matching type wins
+SCAM_TYPE_KEYWORDS = {
+    "bank_fraud": ['bank', 'account'],
+    "upi_scam": ['upi', 'payment'],
+    "prize_scam": ['prize', 'won', 'lottery'],
+    "verification_scam": ['kyc', 'verify'],
+}
+
+_WORD_RE = re.compile(r"[a-z]+")
+_DEVANAGARI_RE = re.compile(r"[\u0900-\u097F]")
+
+# Scam / scam-type words this long also match as a word prefix (suspend -> suspended,
+# account -> accounts); shorter ones ('now', 'won', 'upi') only match whole words
+PREFIX_MIN_LEN = 4
+_VOWELS = frozenset("aeiou")
+
+# Language / region words of 3+ letters match as a prefix too (aap -> aapka / aapko,
+# nahi -> nahin); 'ji' / 'ki' and these would fire inside everyday English words
+LANGUAGE_PREFIX_MIN_LEN = 3
+WHOLE_WORD_ONLY = frozenset({
+    'sir',   # siren
+    'hai',   # hair, hail
+    'ela',   # election, elastic
+    'seri',  # serious, series
+    'enti',  # entire, entitled
+    'heli',  # helicopter
+    'alle',  # alleged, allergy
+})
+
+def _prefix_forms(word: str) -> list:
+    """Prefixes a token may start with to count as `word` (verify -> verifi(ed), close -> clos(ing))"""
+    forms = [word]
+    if word.endswith("y") and word[-2] not in _VOWELS:
+        forms.append(word[:-1] + "i")
+    elif word.endswith("e"):
+        forms.append(word[:-1] + "ing")
+    return forms
+
+def _build_keyword_index():
+    """
+    Build the lookup tables from every keyword table above
+    Exact: phrase (tuple of words) -> list of (table, label, keyword) tags
+    Prefix: word prefix -> tags, for single scam / scam-type words of PREFIX_MIN_LEN+
+    and language / region words of LANGUAGE_PREFIX_MIN_LEN+ (minus WHOLE_WORD_ONLY)
+    Tags carry the table's own keyword string (interned), which is what gets
+    reported - every session's keyword set points at the same few strings
+    """
+    index = {}
+    phrase_lengths = {}  # first word -> distinct phrase lengths starting with it
+    prefixes = {}
+
+    def add(phrase, table, label):
+        words = tuple(phrase.split())
+        tag = (table, label, sys.intern(phrase))
+        forms = None
+        if len(words) == 1:
+            if table in ("category", "scam_type") and len(phrase) >= PREFIX_MIN_LEN:
+                forms = _prefix_forms(phrase)
+            elif table in ("language", "region") and len(phrase) >= LANGUAGE_PREFIX_MIN_LEN \
+                    and phrase not in WHOLE_WORD_ONLY:
+                forms = [phrase]
+        if forms:
+            for form in forms:
+                prefixes.setdefault(form, []).append(tag)
+            return
+        index.setdefault(words, []).append(tag)
+        lengths = phrase_lengths.setdefault(words[0], [])
+        if len(words) not in lengths:
+            lengths.append(len(words))
+
+    for region, words in REGION_KEYWORDS.items():
+        for word in words:
+            add(word, "region", region)
+    for word in LANGUAGE_KEYWORDS:
+        add(word, "language", None)
+    for category, data in SCAM_PATTERNS.items():
+        for word in data['keywords']:
+            add(word, "category", category)
+    for scam_type, words in SCAM_TYPE_KEYWORDS.items():
+        for word in words:
+            add(word, "scam_type", scam_type)
+
+    return index, phrase_lengths, prefixes, sorted({len(form) for form in prefixes})
+
+KEYWORD_INDEX, _PHRASE_LENGTHS, PREFIX_INDEX, _PREFIX_LENGTHS = _build_keyword_index()
+
+def scan_keywords(text: str) -> dict:
+    """
+    Single pass over the message for ALL keyword tables
+    Words match from their start: 'ji' no longer fires inside 'jio', while
+    'suspended' / 'accounts' still count as 'suspend' / 'account' and
+    'aapka' / 'nahin' as 'aap' / 'nahi'
+    Cost grows with message length, not with number of keywords
+    """
+    tokens = _WORD_RE.findall(text.lower())
+
+    categories = {}  # category -> matched keywords (first-seen order)
+    language = []
+    regions = set()
+    scam_types = set()
+
+    def tally(tags):
+        for table, label, keyword in tags:
+            if table == "category":
+                hits = categories.setdefault(label, [])
+                if keyword not in hits:
+                    hits.append(keyword)
+            elif table == "language":
+                if keyword not in language:
+                    language.append(keyword)
+            elif table == "region":
+                regions.add(label)
+            else:
+                scam_types.add(label)
+
+    for i, token in enumerate(tokens):
+        for n in _PREFIX_LENGTHS:
+            if n > len(token):
+                break
+            tags = PREFIX_INDEX.get(token[:n])
+            if tags:
+                tally(tags)
+        lengths = _PHRASE_LENGTHS.get(token)
+        if not lengths:
+            continue
+        for n in lengths:
+            phrase = tuple(tokens[i:i + n]) if n > 1 else (token,)
+            tags = KEYWORD_INDEX.get(phrase)
+            if tags:
+                tally(tags)
+
+    return {
+        "categories": categories,
+        "language": language,
+        "regions": regions,
+        "scam_types": scam_types,
+        "devanagari": _DEVANAGARI_RE.search(text) is not None
+    }
 
 # ========================
 # 1. SMART REGIONAL LANGUAGE DETECTION
 # ========================
-def detect_user_region(text: str) -> str:
+def detect_user_region(text: str, hits: dict = None) -> str:
     """
     Detect user's region from FIRST message only
     User's region STAYS CONSISTENT - we don't adapt to scammer changes
     This maintains believability (Bengali person won't suddenly speak Tamil)
     """
-    text_lower = text.lower()
-    
-    # Bengali indicators
-    bengali_words = ['bhalo', 'accha', 'bujhlam', 'ki', 'keno', 'emon', 'korbo', 'bolchi']
-    
-    # Tamil indicators  
-    tamil_words = ['enna', 'puriyala', 'seri', 'sollunga', 'nalla', 'ponga']
-    
-    # Telugu indicators
-    telugu_words = ['enti', 'artham', 'kaale', 'chepandi', 'ela', 'sare']
-    
-    # Kannada indicators
-    kannada_words = ['yenu', 'gottagilla', 'heli', 'chennagi', 'illa']
-    
-    # Malayalam indicators
-    malayalam_words = ['enthu', 'manassilayilla', 'parayoo', 'nannaayi', 'alle']
-    
-    # Hindi/Hinglish (North India - most common)
-    hindi_words = ['aap', 'kya', 'kaise', 'karo', 'theek', 'haan', 'nahi']
+    if hits is None:
+        hits = scan_keywords(text)
     
     # Check each region (order matters - check specific regions first)
-    if any(word in text_lower for word in bengali_words):
-        return "bengali"
-    elif any(word in text_lower for word in tamil_words):
-        return "tamil"
-    elif any(word in text_lower for word in telugu_words):
-        return "telugu"
-    elif any(word in text_lower for word in kannada_words):
-        return "kannada"
-    elif any(word in text_lower for word in malayalam_words):
-        return "malayalam"
-    elif any(word in text_lower for word in hindi_words):
-        return "north_indian"
+    for region in REGION_KEYWORDS:
+        if region in hits["regions"]:
+            return region
     
     # Default to north Indian (most common for scams)
     return "north_indian"
@@ -140,33 +354,17 @@ Use Hinglish naturally (Hindi-English mix):
     
     return regional_guides.get(region, regional_guides["north_indian"])
 
-def detect_language_style(text: str) -> str:
+def detect_language_style(text: str, hits: dict = None) -> str:
     """Detect English, Hinglish, or Hindi"""
-    text_lower = text.lower()
-    
-    # Hindi/Hinglish indicators
-    hindi_words = [
-        'aap', 'hai', 'karo', 'jaldi', 'turant', 'nahi', 'haan',
-        'kya', 'kaise', 'kyun', 'bhai', 'sir', 'madam', 'ji',
-        'acha', 'theek', 'please', 'matlab', 'samajh', 'batao'
-    ]
-    
-    # Regional words that also indicate non-English
-    regional_words = [
-        'bhalo', 'bujhlam', 'enna', 'puriyala', 'seri',
-        'enti', 'artham', 'yenu', 'gottagilla', 'enthu'
-    ]
+    if hits is None:
+        hits = scan_keywords(text)
     
     # Check for Devanagari script
-    if any('\u0900' <= c <= '\u097F' for c in text):
+    if hits["devanagari"]:
         return "hindi"
     
-    # Count mixed-language indicators
-    mixed_count = sum(1 for word in hindi_words + regional_words if word in text_lower)
-    
-    if mixed_count >= 2:
-        return "hinglish"
-    elif any(word in text_lower for word in hindi_words + regional_words):
+    # Any Hindi/Hinglish or regional indicator means mixed language
+    if hits["language"]:
         return "hinglish"
     
     return "english"
@@ -174,58 +372,30 @@ def detect_language_style(text: str) -> str:
 # ========================
 # 2. ENHANCED SCAM DETECTION
 # ========================
-def detect_scam_advanced(text: str):
+def detect_scam_advanced(text: str, hits: dict = None):
     """Multi-pattern weighted scam detection"""
-    text_lower = text.lower()
-    
-    # Weighted scoring system
-    patterns = {
-        'urgency': {
-            'keywords': ['urgent', 'immediately', 'now', 'today', 'turant', 'jaldi', 'within', 'asap'],
-            'weight': 25
-        },
-        'threats': {
-            'keywords': ['block', 'blocked', 'suspend', 'close', 'legal', 'arrest', 'police', 'court', 'penalty', 'action'],
-            'weight': 30
-        },
-        'financial': {
-            'keywords': ['bank', 'account', 'upi', 'payment', 'transfer', 'credit', 'debit', 'card', 'money'],
-            'weight': 20
-        },
-        'verification': {
-            'keywords': ['verify', 'confirm', 'update', 'validate', 'share', 'provide', 'send', 'otp'],
-            'weight': 20
-        },
-        'impersonation': {
-            'keywords': ['rbi', 'reserve bank', 'government', 'police', 'officer', 'department', 'ministry', 'official'],
-            'weight': 25
-        }
-    }
+    if hits is None:
+        hits = scan_keywords(text)
     
     score = 0
     detected_keywords = []
     matched_categories = []
     
-    for category, data in patterns.items():
-        category_matched = False
-        for keyword in data['keywords']:
-            if keyword in text_lower:
-                if not category_matched:  # Count category only once
-                    score += data['weight']
-                    matched_categories.append(category)
-                    category_matched = True
-                detected_keywords.append(keyword)
+    for category, data in SCAM_PATTERNS.items():
+        keywords = hits["categories"].get(category)
+        if keywords:
+            score += data['weight']  # Count category only once
+            matched_categories.append(category)
+            for keyword in keywords:
+                if keyword not in detected_keywords:
+                    detected_keywords.append(keyword)
     
     # Determine scam type
     scam_type = "unknown"
-    if 'bank' in text_lower or 'account' in text_lower:
-        scam_type = "bank_fraud"
-    elif 'upi' in text_lower or 'payment' in text_lower:
-        scam_type = "upi_scam"
-    elif 'prize' in text_lower or 'won' in text_lower or 'lottery' in text_lower:
-        scam_type = "prize_scam"
-    elif 'kyc' in text_lower or 'verify' in text_lower:
-        scam_type = "verification_scam"
+    for candidate in SCAM_TYPE_KEYWORDS:
+        if candidate in hits["scam_types"]:
+            scam_type = candidate
+            break
     
     confidence = min(score / 100.0, 1.0)
     is_scam = confidence >= 0.6  # 60% threshold
@@ -234,7 +404,7 @@ def detect_scam_advanced(text: str):
         "is_scam": is_scam,
         "score": score,
         "confidence": round(confidence, 2),
-        "keywords": list(set(detected_keywords)),
+        "keywords": detected_keywords,
         "scam_type": scam_type,
         "categories": matched_categories
     }
@@ -242,115 +412,147 @@ def detect_scam_advanced(text: str):
 # ========================
 # 3. ENHANCED INTELLIGENCE EXTRACTION
 # ========================
-def extract_intelligence_advanced(text: str, existing_intel: dict) -> dict:
+# Patterns are compiled once. A single master scan walks the message and
+# hands each candidate span (number run, '@', link, IFSC) to the bucket
+# patterns below, which only ever look at that small window.
+
+# Bank accounts - multiple formats
+BANK_PATTERNS = [
+    re.compile(r'\b\d{11,18}\b'),  # 9-18 digits
+    re.compile(r'\b\d{4}[-\s]?\d{4}[-\s]?\d{4,10}\b'),  # Formatted
+]
+
+# Phone numbers - multiple formats
+PHONE_PATTERNS = [
+    re.compile(r'\+91[-\s]?\d{10}'),
+    re.compile(r'\b[6-9]\d{9}\b'),
+    re.compile(r'\b0\d{10}\b')
+]
+
+# Addresses (basic detection - pincode based)
+PINCODE_PATTERN = re.compile(r'\b[1-9]\d{5}\b')
+
+UPI_PATTERN = re.compile(r'([a-zA-Z0-9.\-_]{2,}@(upi|paytm|ybl|apl|okaxis|oksbi|okicici|gpay))', re.IGNORECASE)
+EMAIL_PATTERN = re.compile(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b')
+URL_PATTERN = r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+'
+
+# Names (basic detection - capitalized words)
+# Each pattern is paired with the literal trigger words it cannot match without,
+# so a message that has none of them never pays for the scan.
+# (?<![a-z]) skips mid-word starts - the word start is always tried first anyway
+NAME_PATTERNS = [
+    (re.compile(r'(?:my name is|i am|this is)\s+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)?)', re.IGNORECASE),
+     ('my name is', 'i am', 'this is')),
+    (re.compile(r'(?<![a-z])([A-Z][a-z]+\s+[A-Z][a-z]+)\s+(?:from|speaking|here)', re.IGNORECASE),
+     ('from', 'speaking', 'here')),
+    (re.compile(r'(?:main|mai|main hoon|i am)\s+([A-Z][a-z]+\s+[A-Z][a-z]+)', re.IGNORECASE),
+     ('mai', 'i am')),
+    (re.compile(r'(?<![a-z])([A-Z][a-z]+\s+[A-Z][a-z]+),?\s+(?:rbi|bank|officer)', re.IGNORECASE),
+     ('rbi', 'bank', 'officer'))
+]
+
+# Master scanner - one walk over the text
+# Links are matched zero-width so digits / handles inside them are still seen.
+# The leading char-class lookahead lets the engine skip plain text quickly
+INTEL_SCANNER = re.compile(
+    r'(?=[h@+0-9A-Z])(?:'
+    r'(?=(?P<url>' + URL_PATTERN + r'))'
+    r'|(?P<at>@)'
+    r'|(?P<num>\+?\d[\d\s-]*)'
+    r'|(?P<ifsc>\b[A-Z]{4}0[A-Z0-9]{6}\b)'
+    r')'
+)
+
+_UPI_LOCAL_CHARS = frozenset('abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789.-_')
+_EMAIL_LOCAL_CHARS = _UPI_LOCAL_CHARS | frozenset('%+')
+_SEPARATORS = re.compile(r'[-\s]')
+
+def _local_part_start(text: str, at: int, charset: frozenset, floor: int) -> int:
+    """Walk left from '@' to where the handle starts (never into the previous match)"""
+    start = at
+    while start > floor and text[start - 1] in charset:
+        start -= 1
+    return start
+
+def extract_intelligence_advanced(text: str, existing_intel: IntelStore) -> IntelStore:
     """Enhanced extraction with deduplication"""
-    
-    # Bank accounts - multiple formats
-    bank_patterns = [
-        r'\b\d{11,18}\b',  # 9-18 digits
-        r'\b\d{4}[-\s]?\d{4}[-\s]?\d{4,10}\b',  # Formatted
-    ]
-    
-    for pattern in bank_patterns:
-        matches = re.findall(pattern, text)
-        for match in matches:
-            clean = re.sub(r'[-\s]', '', match)
-            if 11 <= len(clean) <= 18 and clean not in existing_intel['bankAccounts']:
-                existing_intel['bankAccounts'].append(clean)
-    
-    # UPI IDs
-    upi_pattern = r'([a-zA-Z0-9.\-_]{2,}@(upi|paytm|ybl|apl|okaxis|oksbi|okicici|gpay))'
+    add = existing_intel.add
 
-    matches = re.findall(upi_pattern, text, re.IGNORECASE)
+    url_end = upi_end = email_end = 0
+    for m in INTEL_SCANNER.finditer(text):
+        kind = m.lastgroup
 
-    for full, provider in matches:
-        upi = full.strip().lower()
-        if upi not in existing_intel['upiIds']:
-            existing_intel['upiIds'].append(upi)
+        if kind == 'num':
+            # Number run - bank accounts, phones, pincodes
+            # Window keeps one char of right context so \b behaves as on full text
+            start, end = m.start(), min(m.end() + 1, len(text))
+            for pattern in BANK_PATTERNS:
+                for match in pattern.finditer(text, start, end):
+                    clean = _SEPARATORS.sub('', match.group())
+                    if 11 <= len(clean) <= 18:
+                        add('bankAccounts', clean)
+            for pattern in PHONE_PATTERNS:
+                for match in pattern.finditer(text, start, end):
+                    add('phoneNumbers', _SEPARATORS.sub('', match.group()))
+            for match in PINCODE_PATTERN.finditer(text, start, end):
+                add('pincodes', match.group())
 
-    
-    # Phone numbers - multiple formats
-    phone_patterns = [
-        r'\+91[-\s]?\d{10}',
-        r'\b[6-9]\d{9}\b',
-        r'\b0\d{10}\b'
-    ]
-    
-    for pattern in phone_patterns:
-        matches = re.findall(pattern, text)
-        for match in matches:
-            clean = re.sub(r'[-\s]', '', match)
-            if clean not in existing_intel['phoneNumbers']:
-                existing_intel['phoneNumbers'].append(clean)
-    
-    # URLs
-    url_pattern = r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+'
-    urls = re.findall(url_pattern, text)
-    for url in urls:
-        url = url.rstrip('.,)')
-        if url not in existing_intel['phishingLinks']:
-            existing_intel['phishingLinks'].append(url)
-    
-    # Email addresses (for scammer contact)
-    email_pattern = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
-    emails = re.findall(email_pattern, text)
-    for email in emails:
-        if email not in existing_intel.get('emailAddresses', []):
-            if 'emailAddresses' not in existing_intel:
-                existing_intel['emailAddresses'] = []
-            existing_intel['emailAddresses'].append(email)
-    
-    # Names (basic detection - capitalized words)
-    # Look for "My name is X" or "I am X from"
-    name_patterns = [
-    r'(?:my name is|i am|this is)\s+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)?)',
-    r'([A-Z][a-z]+\s+[A-Z][a-z]+)\s+(?:from|speaking|here)',
-    r'(?:main|mai|main hoon|i am)\s+([A-Z][a-z]+\s+[A-Z][a-z]+)',
-    r'([A-Z][a-z]+\s+[A-Z][a-z]+),?\s+(?:rbi|bank|officer)'
-    ]
+        elif kind == 'at':
+            # UPI IDs / email addresses
+            at = m.start()
+            upi = UPI_PATTERN.match(text, _local_part_start(text, at, _UPI_LOCAL_CHARS, upi_end))
+            if upi:
+                upi_end = upi.end()
+                add('upiIds', upi.group(1).strip().lower())
+            for start in range(_local_part_start(text, at, _EMAIL_LOCAL_CHARS, email_end), at):
+                email = EMAIL_PATTERN.match(text, start)
+                if email:
+                    email_end = email.end()
+                    add('emailAddresses', email.group())
+                    break
+
+        elif kind == 'url':
+            # URLs
+            if m.start() >= url_end:
+                url_end = m.end('url')
+                add('phishingLinks', m.group('url').rstrip('.,)'))
 
-    for pattern in name_patterns:
-        names = re.findall(pattern, text, re.IGNORECASE)
-        for name in names:
+        else:
+            # IFSC codes
+            add('ifscCodes', m.group())
+
+    # Look for "My name is X" or "I am X from"
+    text_lower = text.lower()
+    for pattern, triggers in NAME_PATTERNS:
+        if not any(trigger in text_lower for trigger in triggers):
+            continue
+        for name in pattern.findall(text):
             if isinstance(name, tuple):
                 name = name[0] if name[0] else name[1]
             name = name.strip()
-            if len(name) > 2 and name not in existing_intel.get('scammerNames', []):
-                if 'scammerNames' not in existing_intel:
-                    existing_intel['scammerNames'] = []
-                existing_intel['scammerNames'].append(name)
-    
-    # Addresses (basic detection - pincode based)
-    pincode_pattern = r'\b[1-9]\d{5}\b'
-    pincodes = re.findall(pincode_pattern, text)
-    for pin in pincodes:
-        if pin not in existing_intel.get('pincodes', []):
-            if 'pincodes' not in existing_intel:
-                existing_intel['pincodes'] = []
-            existing_intel['pincodes'].append(pin)
-    
-    # IFSC codes
-    ifsc_pattern = r'\b[A-Z]{4}0[A-Z0-9]{6}\b'
-    ifsc_codes = re.findall(ifsc_pattern, text)
-    for code in ifsc_codes:
-        if code not in existing_intel.get('ifscCodes', []):
-            if 'ifscCodes' not in existing_intel:
-                existing_intel['ifscCodes'] = []
-            existing_intel['ifscCodes'].append(code)
+            if len(name) > 2:
+                add('scammerNames', name)
     
     # Store raw text snippets that might contain addresses or other info
     # This catches anything we might have missed
     if len(text) > 20:  # Only store substantial messages
-        if 'rawMessages' not in existing_intel:
-            existing_intel['rawMessages'] = []
-        if text not in existing_intel['rawMessages']:
-            existing_intel['rawMessages'].append(text[:200])  # First 200 chars
+        add('rawMessages', text[:200])  # First 200 chars
     
     return existing_intel
 
 # ========================
 # 4. DYNAMIC PERSONA GENERATION
 # ========================
+def persona_stage(turn: int) -> str:
+    """Conversation stage bucket (shared by persona prompts and the reply cache)"""
+    if turn <= 2:
+        return "initial"
+    elif turn <= 5:
+        return "building_trust"
+    elif turn <= 10:
+        return "extracting"
+    return "final"
+
 def generate_persona(scam_type: str, language_style: str, turn: int) -> str:
     """Generate persona based on scam type and stage"""
     
@@ -381,29 +583,53 @@ def generate_persona(scam_type: str, language_style: str, turn: int) -> str:
     persona = personas.get(scam_type, personas["bank_fraud"]).get(language_style, "confused person")
     
     # Stage-based instructions
-    if turn <= 2:
-        stage = "INITIAL: Show worry/confusion. Ask what's happening."
-    elif turn <= 5:
-        stage = "BUILDING TRUST: Show willingness. Ask clarifying questions."
-    elif turn <= 10:
-        stage = "EXTRACTING: Pretend to comply but need details. Ask for their account/number 'to verify'."
-    else:
-        stage = "FINAL: Show technical difficulties. Request alternative methods."
+    stages = {
+        "initial": "INITIAL: Show worry/confusion. Ask what's happening.",
+        "building_trust": "BUILDING TRUST: Show willingness. Ask clarifying questions.",
+        "extracting": "EXTRACTING: Pretend to comply but need details. Ask for their account/number 'to verify'.",
+        "final": "FINAL: Show technical difficulties. Request alternative methods."
+    }
+    stage = stages[persona_stage(turn)]
     
     return f"You are a {persona}. {stage}"
 
 # ========================
 # 5. ENHANCED GEMINI INTERACTION
 # ========================
+# Sanitize + trim, compiled once - see reply_pipeline.py
+reply_pipeline = ReplyPipeline()
+
 async def ask_gemini_enhanced(
     history: list,
     current_msg: str,
     scam_type: str,
     language_style: str,
     user_region: str,
-    turn: int
+    turn: int,
+    intel: IntelStore = None
 ) -> str:
     """Enhanced Gemini interaction with timeout + safe trimming"""
+    stage = persona_stage(turn)
+
+    # Early low-value turns can be answered without the model
+    if turn <= LOCAL_REPLY_TURNS:
+        return add_human_touches(
+            local_replies.reply(scam_type, language_style, user_region, stage, intel, reason="early_turn"),
+            language_style
+        )
+
+    # Hot scam scripts are answered from the reply cache
+    cache_key = reply_cache.key(current_msg, scam_type, language_style, user_region, stage)
+    cached = reply_cache.get(cache_key)
+    if cached is not None:
+        return add_human_touches(cached, language_style)
+
+    # Overloaded - answer now instead of queueing behind the model pool
+    if not gemini.admit():
+        return add_human_touches(
+            local_replies.reply(scam_type, language_style, user_region, stage, intel, reason="shed"),
+            language_style
+        )
 
     persona = generate_persona(scam_type, language_style, turn)
 
@@ -438,91 +664,54 @@ SCAMMER JUST SAID: {current_msg}
 Your confused response (1-2 sentences only):"""
 
     try:
-        start = time.time()
-
-        response = await asyncio.wait_for(
-            asyncio.to_thread(
-                client.models.generate_content,
-                model=MODEL_NAME,
-                contents=prompt
-            ),
-            timeout=8
-        )
-
-        print("⏱️ Gemini time:", round(time.time() - start, 2), "sec")
+        # Queue + model time are recorded by the pool, post-processing here (see /metrics)
+        if gemini.stream:
+            # Stop reading (and paying for) output once 2 sentences are in
+            stream = reply_pipeline.stream()
+            await gemini.generate_stream(prompt, stream.feed)
+            start = time.perf_counter()
+            text = stream.text()
+        else:
+            raw = await gemini.generate(prompt)
+            start = time.perf_counter()
+            text = reply_pipeline(raw)
+        record_stage("gemini_postprocess", start, time.perf_counter())
 
-        text = response.text.strip()
+        reply_cache.put(cache_key, text)
 
-        # Keep ASCII + Devanagari
-        text = ''.join(c for c in text if c.isascii() or '\u0900' <= c <= '\u097F')
+        return add_human_touches(text, language_style)
 
-        # Normalize spaces
-        text = re.sub(r'\s+', ' ', text).strip()
+    except CircuitOpenError:
+        # Upstream is down - answer locally right away
+        reason = "breaker_open"
 
-        # Remove banned words safely
-        ban_words = [
-            "salary", "rent", "mummy", "papa", "fees", "bp",
-            "tension", "savings", "family", "bacha", "health",
-            "income", "loan", "emi", "daughter", "son"
-        ]
+    except QuotaExhaustedError:
+        # Every key is over its local budget or cooling down after a 429
+        reason = "quota"
 
-        for word in ban_words:
-            text = re.sub(rf'\b{word}\b', '', text, flags=re.IGNORECASE)
-
-        text = re.sub(r'\s+', ' ', text).strip()
-
-        # Sentence-aware trimming
-        parts = re.split(r'(?<=[.!?])\s+', text)
-
-        text = " ".join(parts[:2]).strip()
-
-        MAX_LEN = 150
-
-        if len(text) > MAX_LEN:
-            cut = text[:MAX_LEN]
-
-            m = re.search(r'[.!?](?!.*[.!?])', cut)
-
-            if m:
-                text = cut[:m.end()]
-            else:
-                text = cut.rsplit(" ", 1)[0]
+    except Exception as e:
+        print("❌ GEMINI ERROR:", e or type(e).__name__)
+        reason = "fallback"
 
-        # Add natural pauses (rare)
-        if random.random() < 0.12:
-            pauses = ["Ek minute... ", "Wait... ", "Hmm... "] \
-                if language_style == "hinglish" else ["Let me think... ", "Wait... "]
+    return add_human_touches(
+        local_replies.reply(scam_type, language_style, user_region, stage, intel, reason=reason),
+        language_style
+    )
 
-            text = random.choice(pauses) + text
+def add_human_touches(text: str, language_style: str) -> str:
+    """Rare thinking pauses + end punctuation (applied per reply, also to cached ones)"""
 
-        if not text.endswith(('.', '?', '!')):
-            text += random.choice(['.', '?'])
+    # Add natural pauses (rare)
+    if random.random() < 0.12:
+        pauses = ["Ek minute... ", "Wait... ", "Hmm... "] \
+            if language_style == "hinglish" else ["Let me think... ", "Wait... "]
 
-        return text if text else "Samajh nahi aa raha. Thoda clearly batao?"
+        text = random.choice(pauses) + text
 
-    except Exception as e:
-        print("❌ GEMINI ERROR:", e)
-
-        fallbacks = {
-    "english": [
-        "I'm confused. Can you explain properly?",
-        "Wait, I don't understand this.",
-        "Can you send details again?",
-        "This link is not opening for me."
-    ],
-    "hinglish": [
-        "Samajh nahi aa raha, thoda clearly batao.",
-        "Ruko, mujhe doubt ho raha hai.",
-        "Ye process thoda confusing lag raha hai.",
-        "Aap pehle apna number confirm karo."
-    ],
-    "hindi": [
-        "समझ नहीं आ रहा, फिर से बताइए।",
-        "यह लिंक काम नहीं कर रहा।"
-    ]
-}
+    if not text.endswith(('.', '?', '!')):
+        text += random.choice(['.', '?'])
 
-    return random.choice(fallbacks.get(language_style, fallbacks["hinglish"]))
+    return text if text else "Samajh nahi aa raha. Thoda clearly batao?"
 
 
 
@@ -532,8 +721,11 @@ Your confused response (1-2 sentences only):"""
 # ========================
 GUVI_CALLBACK = "https://hackathon.guvi.in/api/updateHoneyPotFinalResult"
 
+# Delivery runs in background workers - see guvi_callback.py
+callbacks = CallbackDispatcher(GUVI_CALLBACK)
+
 def send_to_guvi(session_id: str, history: list, intel: dict, keywords: list, scam_type: str):
-    """Send final results to GUVI"""
+    """Queue final results for GUVI (never blocks the request)"""
     
     # Generate agent notes
     intel_summary = []
@@ -577,146 +769,309 @@ def send_to_guvi(session_id: str, history: list, intel: dict, keywords: list, sc
         "agentNotes": notes
     }
     
-    try:
-        r = requests.post(GUVI_CALLBACK, json=payload, timeout=10)
-        print(f"✅ GUVI CALLBACK: {r.status_code} - Session: {session_id}")
-        print(f"📊 Extracted: {summary}")
-        if extra_notes:
-            print(f"📌 Additional: {'; '.join(extra_notes)}")
-        return True
-    except Exception as e:
-        print(f"❌ GUVI CALLBACK ERROR: {e}")
+    if not callbacks.submit(payload):
         return False
+    print(f"📤 GUVI CALLBACK QUEUED - Session: {session_id}")
+    print(f"📊 Extracted: {summary}")
+    if extra_notes:
+        print(f"📌 Additional: {'; '.join(extra_notes)}")
+    return True
+
+def finalize_session(session_id: str, meta: SessionState) -> bool:
+    """Submit a scam session to GUVI if it never was (used when sessions are evicted)"""
+    if not meta.scam_detected or meta.submitted:
+        return False
+    start = time.perf_counter()
+    queued = send_to_guvi(
+        session_id,
+        meta.history,
+        meta.intel.to_dict(),
+        meta.keywords.to_list(),
+        meta.scam_type
+    )
+    record_stage("send_to_guvi", start, time.perf_counter())
+    # Dispatcher not running -> stays unsubmitted and is retried next turn
+    meta.submitted = queued
+    return queued
+
+async def sweep_sessions_forever():
+    """Expire idle sessions even when no traffic arrives to trigger it"""
+    while True:
+        await asyncio.sleep(SESSION_SWEEP_SECONDS)
+        expired = await store.sweep()
+        if expired:
+            print(f"🧹 Expired {expired} idle sessions")
 
 # ========================
 # 7. MAIN API ENDPOINT
 # ========================
-@app.post("/honeypot")
-async def honeypot(request: Request):
-    """Enhanced honeypot endpoint with all features"""
-    
-    # Authentication
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "100"))
+
+# Per-request spans -> Server-Timing header (+ sampled JSONL file) - see tracing.py
+tracer = Tracer()
+
+def check_api_key(request: Request):
     key = request.headers.get("x-api-key")
     if key != API_KEY:
         raise HTTPException(status_code=401, detail="Invalid API Key")
-    
-    # Parse request
-    data = await request.json()
+
+async def run_turn(data: dict, idempotency_key: str = None):
+    """One /honeypot payload -> (response, replayed); shared by the single and batch endpoints"""
     session_id = data.get("sessionId", "default")
-    message = data.get("message", {}).get("text", "").strip()
+    if not isinstance(session_id, str):
+        raise HTTPException(status_code=400, detail="sessionId must be a string")
+    current = data.get("message", {})
+    if not isinstance(current, dict) or not isinstance(current.get("text", ""), str):
+        raise HTTPException(status_code=400, detail="message must be an object with a text string")
+    message = current.get("text", "").strip()
     
     if not message:
         raise HTTPException(status_code=400, detail="Empty message")
     
-    incoming_history = data.get("conversationHistory", [])
+    incoming_history = data.get("conversationHistory") or []
+    if not isinstance(incoming_history, list):
+        raise HTTPException(status_code=400, detail="conversationHistory must be a list")
+    # Malformed entries are skipped, they must not fail the turn
+    incoming_history = [
+        m for m in incoming_history
+        if isinstance(m, dict) and isinstance(m.get("text", ""), str) and isinstance(m.get("sender", ""), str)
+    ]
+    
+    # Platform retries of the same turn must not run it again
+    turn_key = request_key(session_id, message, current.get("timestamp"), idempotency_key)
+    
+    # Turns of one session run strictly one after another, sessions stay parallel
+    async def locked_turn():
+        async with session_locks.hold(session_id):
+            return await handle_turn(
+                session_id, message, incoming_history,
+                message_mark(current.get("sender", "scammer"), message, current.get("timestamp"))
+            )
+    
+    try:
+        return await idempotency.run(turn_key, locked_turn)
+    finally:
+        profiler.request_done()
+
+@app.post("/honeypot")
+async def honeypot(request: Request, response: Response):
+    """Enhanced honeypot endpoint with all features"""
+    
+    start = time.perf_counter()
+    trace = tracer.begin("honeypot")
+    status = 500
+    
+    try:
+        # Authentication
+        check_api_key(request)
+        
+        # Parse request
+        data = await request.json()
+        record_stage("auth_parse", start, time.perf_counter())
+        if trace is not None:
+            trace.session_id = data.get("sessionId")
+        
+        result, replayed = await run_turn(data, request.headers.get("idempotency-key"))
+        status = 200
+    except HTTPException as e:
+        status = e.status_code
+        raise
+    finally:
+        if trace is not None:
+            response.headers["Server-Timing"] = tracer.finish(trace, status)
+    
+    if replayed:
+        response.headers["Idempotent-Replayed"] = "true"
+    REQUEST_SECONDS.observe(time.perf_counter() - start, "honeypot")
+    return result
+
+@app.post("/honeypot/batch")
+async def honeypot_batch(request: Request):
+    """
+    Many turns in one request: {"items": [<honeypot payload>, ...]}
+    Sessions run concurrently (model calls share the pool limit), turns of the
+    same session run in batch order. ?stream=1 or Accept: application/x-ndjson
+    streams one result line per item as it completes.
+    """
+    start = time.perf_counter()
+    check_api_key(request)
+    
+    data = await request.json()
+    record_stage("auth_parse", start, time.perf_counter())
+    items = data.get("items") if isinstance(data, dict) else data
+    if not isinstance(items, list):
+        raise HTTPException(status_code=400, detail="Expected {\"items\": [...]}")
+    if len(items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {BATCH_MAX_ITEMS} items per batch")
+    
+    # Per-session queues keep batch order inside a session
+    by_session = {}
+    for index, item in enumerate(items):
+        session_id = item.get("sessionId", "default") if isinstance(item, dict) else None
+        if not isinstance(session_id, str):
+            session_id = None  # invalid items - each one is reported as an error below
+        by_session.setdefault(session_id, []).append(index)
+    
+    done = asyncio.Queue()
+    
+    async def run_session(indexes: list):
+        for index in indexes:
+            item = items[index]
+            try:
+                if not isinstance(item, dict):
+                    raise HTTPException(status_code=400, detail="Item must be an object")
+                result, replayed = await run_turn(item, item.get("idempotencyKey"))
+                result = {"index": index, "replayed": replayed, **result}
+            except HTTPException as e:
+                result = {"index": index, "status": "error", "error": e.detail}
+            except Exception as e:
+                print(f"❌ BATCH ITEM ERROR: {index} - {e}")
+                result = {"index": index, "status": "error", "error": "Internal error"}
+            await done.put(result)
+    
+    # Tasks are not tied to the client connection - turns finish even if it drops
+    tasks = [asyncio.create_task(run_session(indexes)) for indexes in by_session.values()]
+    
+    stream = request.query_params.get("stream") == "1" or \
+        "application/x-ndjson" in request.headers.get("accept", "")
+    
+    if stream:
+        async def lines():
+            for _ in range(len(items)):
+                yield json.dumps(await done.get(), ensure_ascii=False) + "\n"
+            REQUEST_SECONDS.observe(time.perf_counter() - start, "honeypot_batch")
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+    
+    await asyncio.gather(*tasks)
+    results = [None] * len(items)
+    while not done.empty():
+        result = done.get_nowait()
+        results[result["index"]] = result
+    REQUEST_SECONDS.observe(time.perf_counter() - start, "honeypot_batch")
+    return {"status": "success", "count": len(items), "results": results}
 
-    if incoming_history and session_id not in sessions:
-        sessions[session_id] = [
-            f"{m['sender'].capitalize()}: {m['text']}"
-            for m in incoming_history
-        ]
+async def handle_turn(session_id: str, message: str, incoming_history: list, mark: str = None) -> dict:
+    """One conversation turn: ingest unseen history, detect, extract, reply, persist"""
+    
+    clock = time.perf_counter
+    
+    # One keyword scan feeds language, scam and region detection
+    t0 = clock()
+    hits = scan_keywords(message)
     
     # Detect language style
-    language_style = detect_language_style(message)
+    t1 = clock()
+    language_style = detect_language_style(message, hits)
     
     # Advanced scam detection
-    detection = detect_scam_advanced(message)
+    t2 = clock()
+    detection = detect_scam_advanced(message, hits)
+    t3 = clock()
+    record_stage("scan_keywords", t0, t1)
+    record_stage("detect_language_style", t1, t2)
+    record_stage("detect_scam_advanced", t2, t3)
     
     # Initialize session if new
-    if session_id not in sessions:
+    meta = await store.load(session_id)
+    record_stage("session_load", t3, clock())
+    is_new = meta is None
+    if is_new:
         # Detect user's region from FIRST message (stays consistent)
-        user_region = detect_user_region(message)
-        
-        sessions[session_id] = []
-        session_meta[session_id] = {
-            "submitted": False,
-            "scam_detected": False,
-            "scam_type": "unknown",
-            "language_style": language_style,
-            "user_region": user_region,  # SET ONCE, NEVER CHANGES
-            "turn_count": 0,
-            "intel": {
-                "upiIds": [],
-                "bankAccounts": [],
-                "phoneNumbers": [],
-                "phishingLinks": [],
-                "emailAddresses": [],
-                "scammerNames": [],
-                "pincodes": [],
-                "ifscCodes": [],
-                "rawMessages": []
-            },
-            "keywords": []
-        }
-    
-    meta = session_meta[session_id]
-    meta["turn_count"] += 1
-    meta["language_style"] = language_style
+        user_region = detect_user_region(message, hits)
+        meta = SessionState(language_style, user_region)
+    
+    # Client-side history: only messages we haven't ingested yet (all of them the first time)
+    history = meta.history
+    history_start = len(history)
+    turn_intel = IntelStore()
+    earlier_keywords = []
+    earlier = unseen_messages(incoming_history, meta.history_marks)
+    for _, m in earlier:
+        sender = m.get("sender", "")
+        text = m.get("text", "")
+        if sender.lower() == "scammer":
+            # Messages we never saw as a turn still count for detection + intel
+            earlier_detection = detect_scam_advanced(text)
+            if earlier_detection["is_scam"] and not meta.scam_detected:
+                meta.scam_detected = True
+                meta.scam_type = earlier_detection["scam_type"]
+                SCAMS_DETECTED.inc()
+                print(f"🚨 Scam detected in history: {session_id} - Type: {earlier_detection['scam_type']}")
+            extract_intelligence_advanced(text, turn_intel)
+            earlier_keywords += meta.keywords.update(earlier_detection["keywords"])
+        elif not is_new:
+            continue  # our own earlier replies are already in history
+        history.append(f"{sender.capitalize()}: {text}")
+    meta.remember_marks([m for m, _ in earlier] + ([mark] if mark else []))
+    
+    if is_new:
+        await store.create(session_id, meta)
+        history_start = len(history)
+    
+    meta.turn_count += 1
+    meta.language_style = language_style
     
     # Update scam detection status
-    if detection["is_scam"] and not meta["scam_detected"]:
-        meta["scam_detected"] = True
-        meta["scam_type"] = detection["scam_type"]
+    if detection["is_scam"] and not meta.scam_detected:
+        meta.scam_detected = True
+        meta.scam_type = detection["scam_type"]
+        SCAMS_DETECTED.inc()
         print(f"🚨 Scam detected: {session_id} - Type: {detection['scam_type']} - Confidence: {detection['confidence']}")
     
     # Once scam, always scam (stability)
-    if meta["scam_detected"]:
+    if meta.scam_detected:
       detection["confidence"] = max(detection["confidence"], 0.7)
       detection["is_scam"] = True
 
     
     # Extract and accumulate intelligence
-    current_intel = extract_intelligence_advanced(message, {
-        "upiIds": [],
-        "bankAccounts": [],
-        "phoneNumbers": [],
-        "phishingLinks": [],
-        "emailAddresses": [],
-        "scammerNames": [],
-        "pincodes": [],
-        "ifscCodes": [],
-        "rawMessages": []
-    })
-    
-    for key in meta["intel"]:
-        meta["intel"][key] = list(set(meta["intel"][key] + current_intel[key]))
+    t0 = clock()
+    current_intel = extract_intelligence_advanced(message, IntelStore())
+    record_stage("extract_intelligence_advanced", t0, clock())
+    turn_intel.merge(current_intel)
+    new_intel = meta.intel.merge(turn_intel)
     
     # Accumulate keywords
-    meta["keywords"] = list(set(meta["keywords"] + detection["keywords"]))
+    new_keywords = earlier_keywords + meta.keywords.update(detection["keywords"])
     
     # Add to conversation history
-    history = sessions[session_id]
     history.append(f"Scammer: {message}")
     
     # Generate AI response with enhanced prompting
+    t0 = clock()
     reply = await ask_gemini_enhanced(
         history,
         message,
-        meta["scam_type"],
-        meta["language_style"],
-        meta["user_region"],  # User's region (consistent throughout)
-        meta["turn_count"]
+        meta.scam_type,
+        meta.language_style,
+        meta.user_region,  # User's region (consistent throughout)
+        meta.turn_count,
+        meta.intel
     )
     
+    record_stage("ask_gemini_enhanced", t0, clock())
+    
     history.append(f"You: {reply}")
-    sessions[session_id] = history
     
     # Auto-submit to GUVI (after sufficient engagement)
     should_submit = (
-        meta["scam_detected"] and
-        meta["turn_count"] >= 8 and
-        not meta["submitted"]
+        meta.scam_detected and
+        meta.turn_count >= 8 and
+        not meta.submitted
     )
     
     if should_submit:
-        send_to_guvi(
-            session_id,
-            history,
-            meta["intel"],
-            meta["keywords"],
-            meta["scam_type"]
-        )
-        meta["submitted"] = True
+        finalize_session(session_id, meta)
+    
+    # Persist only what this turn changed
+    t0 = clock()
+    await store.commit_turn(session_id, meta, {
+        "history": history[history_start:],
+        "intel": new_intel,
+        "keywords": new_keywords,
+        "turns": 1
+    })
+    record_stage("session_commit", t0, clock())
     
     # Return response
     return {
@@ -725,8 +1080,8 @@ async def honeypot(request: Request):
         "scamDetected": detection["is_scam"],
         "confidence": detection["confidence"],
         "keywords": detection["keywords"],
-        "extractedIntelligence": current_intel,
-        "sessionTurns": meta["turn_count"],
+        "extractedIntelligence": current_intel.to_dict(),
+        "sessionTurns": meta.turn_count,
         "languageDetected": language_style
     }
 
@@ -747,7 +1102,7 @@ def home():
             "Human behavior simulation",
             "Advanced intelligence extraction"
         ],
-        "active_sessions": len(sessions)
+        "active_sessions": store.stats()["live_sessions"]
     }
 
 @app.get("/health")
@@ -755,34 +1110,145 @@ def health():
     return {
         "status": "healthy",
         "timestamp": datetime.now().isoformat(),
-        "active_sessions": len(sessions),
-        "model": MODEL_NAME
+        "active_sessions": store.stats()["live_sessions"],
+        "sessions": store.stats(),
+        "session_locks": session_locks.stats(),
+        "callbacks": callbacks.stats(),
+        "gemini": gemini.stats(),
+        "reply_cache": reply_cache.stats(),
+        "local_replies": local_replies.stats(),
+        "load_shedding": gemini.shed_stats(),
+        "idempotency": idempotency.stats(),
+        "tracing": tracer.stats(),
+        "model": GEMINI_MODELS[0],
+        "models": GEMINI_MODELS
     }
 
 @app.get("/stats")
-def stats():
+async def stats():
     """Statistics endpoint"""
+    totals = await store.totals()
     total_intel = {
-        "upiIds": 0,
-        "bankAccounts": 0,
-        "phoneNumbers": 0,
-        "phishingLinks": 0
+        key: totals["intel"][key]
+        for key in ("upiIds", "bankAccounts", "phoneNumbers", "phishingLinks")
     }
     
-    scam_count = 0
-    for meta in session_meta.values():
-        if meta["scam_detected"]:
-            scam_count += 1
-        for key in total_intel:
-            total_intel[key] += len(meta["intel"][key])
-    
     return {
-        "total_sessions": len(sessions),
-        "scams_detected": scam_count,
+        "total_sessions": totals["total_sessions"],
+        "scams_detected": totals["scams_detected"],
         "total_intelligence": total_intel,
-        "submitted_to_guvi": sum(1 for m in session_meta.values() if m["submitted"])
+        "submitted_to_guvi": totals["submitted"],
+        "session_store": store.stats(),
+        "session_locks": session_locks.stats(),
+        "callbacks": callbacks.stats(),
+        "gemini": gemini.stats(),
+        "reply_cache": reply_cache.stats(),
+        "local_replies": local_replies.stats(),
+        "load_shedding": gemini.shed_stats(),
+        "idempotency": idempotency.stats()
     }
 
+# Read from existing stats at scrape time - nothing extra on the request path
+REGISTRY.register(Sampled(
+    "honeypot_live_sessions", "Sessions currently held by the session store", "gauge",
+    lambda: store.stats()["live_sessions"]
+))
+REGISTRY.register(Sampled(
+    "honeypot_local_replies_total", "Replies served without the model, by reason", "counter",
+    lambda: local_replies.served, label="reason"
+))
+REGISTRY.register(Sampled(
+    "honeypot_gemini_timeouts_total", "Model calls that hit the timeout", "counter",
+    lambda: gemini.timeouts
+))
+REGISTRY.register(Sampled(
+    "honeypot_gemini_errors_total", "Model calls that failed", "counter",
+    lambda: gemini.errors
+))
+REGISTRY.register(Sampled(
+    "honeypot_gemini_shed_total", "Turns answered locally because the model pool was overloaded", "counter",
+    lambda: gemini.shed
+))
+REGISTRY.register(Sampled(
+    "honeypot_gemini_in_flight", "Model calls running", "gauge",
+    lambda: gemini.in_flight
+))
+REGISTRY.register(Sampled(
+    "honeypot_gemini_waiting", "Model calls waiting for a pool slot", "gauge",
+    lambda: gemini.waiting
+))
+
+@app.get("/metrics")
+def metrics():
+    """Prometheus text format: per-stage latency histograms, counters, gauges"""
+    return PlainTextResponse(REGISTRY.render(), media_type=CONTENT_TYPE)
+
+# ========================
+# 9. ADMIN (live profiling + memory)
+# ========================
+# cProfile for the next N turns / T seconds - see profiler.py
+profiler = RequestProfiler()
+
+def check_admin_key(request: Request):
+    """Admin routes need their own key; without ADMIN_API_KEY they don't exist"""
+    if not ADMIN_API_KEY:
+        raise HTTPException(status_code=404, detail="Not Found")
+    key = request.headers.get("x-api-key") or ""
+    if not hmac.compare_digest(key.encode(), ADMIN_API_KEY.encode()):
+        raise HTTPException(status_code=401, detail="Invalid API Key")
+
+@app.post("/admin/profile")
+async def start_profile(request: Request, requests: int = 0, seconds: float = 0):
+    """Profile the next `requests` turns or `seconds` (first limit wins), then dump + report"""
+    check_admin_key(request)
+    try:
+        return profiler.start(requests, seconds)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@app.post("/admin/profile/stop")
+async def stop_profile(request: Request):
+    check_admin_key(request)
+    report = profiler.stop()
+    if report is None:
+        raise HTTPException(status_code=409, detail="No profile running")
+    return report
+
+@app.get("/admin/profile")
+async def profile_status(request: Request):
+    """Current capture + report of the last one"""
+    check_admin_key(request)
+    return profiler.status()
+
+# tracemalloc snapshots / diffs - see memory_report.py
+allocations = AllocationTracker()
+
+@app.get("/admin/memory")
+async def memory_report(request: Request, top: int = MEMORY_TOP):
+    """Approximate bytes per session held by this process, the largest N, tracemalloc state"""
+    check_admin_key(request)
+    return {
+        "sessions": await session_report(store, top),
+        "tracemalloc": allocations.stats()
+    }
+
+@app.post("/admin/memory/tracemalloc")
+async def memory_tracemalloc(request: Request, enabled: bool = True, frames: int = 0):
+    """Start (enabled=true) or stop tracemalloc; starting resets the baseline"""
+    check_admin_key(request)
+    return allocations.start(frames) if enabled else allocations.stop()
+
+@app.post("/admin/memory/snapshot")
+async def memory_snapshot(request: Request, top: int = MEMORY_TOP, group_by: str = "lineno", project_only: bool = True):
+    """First call: top allocation sites; later calls: growth since the previous snapshot"""
+    check_admin_key(request)
+    try:
+        return allocations.snapshot(top, group_by, project_only)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 # ========================
 # Run
 # ========================
@@ -0,0 +1,175 @@
+"""
+Memory Report - per-session footprint + tracemalloc snapshots / diffs
+Session sizes are approximate (sys.getsizeof of the record, its history
+lines, intel buckets and keywords; interned keywords are counted in every
+session that holds them). tracemalloc diffs tie growth to the lines / call
+stacks that allocated it, e.g. extract_intelligence_advanced or history
+handling. Both walk the heap on the event loop - debug endpoints only.
+"""
+
+import heapq
+import os
+import sys
+import tracemalloc
+
+from session_state import SessionState
+
+# ========================
+# Tuning
+# ========================
+MEMORY_TOP = int(os.getenv("MEMORY_TOP", "10"))  # sessions / allocation sites listed
+TRACEMALLOC_FRAMES = int(os.getenv("TRACEMALLOC_FRAMES", "10"))  # stack depth kept per allocation
+
+_PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+# ========================
+# 1. SESSION FOOTPRINT
+# ========================
+def session_footprint(meta: SessionState) -> dict:
+    """Approximate bytes of one session record, by component"""
+    history = meta.history
+    marks = meta.history_marks
+    intel = meta.intel.footprint()
+    # Interned strings (scam type, language, region) are shared - only the slots count
+    sizes = {
+        "history": sys.getsizeof(history) + sum(map(sys.getsizeof, history)),
+        "history_marks": sys.getsizeof(marks) + sum(map(sys.getsizeof, marks)),
+        "intel": sys.getsizeof(meta.intel) + sum(intel.values()),
+        "keywords": meta.keywords.footprint(),
+        "record": sys.getsizeof(meta)
+    }
+    sizes["total"] = sum(sizes.values())
+    sizes["intel_fields"] = intel
+    return sizes
+
+
+async def session_report(store, top: int = MEMORY_TOP) -> dict:
+    """Sizes of the sessions this process holds: totals, per component, the largest N"""
+    backend = store.stats()["backend"]
+    return await store.inspect(lambda resident: _report(resident, backend, top))
+
+
+def _report(resident: list, backend: str, top: int) -> dict:
+    components = {"history": 0, "history_marks": 0, "intel": 0, "keywords": 0, "record": 0}
+    intel_fields = {}
+    sizes = []
+    for session_id, meta in resident:
+        footprint = session_footprint(meta)
+        for name in components:
+            components[name] += footprint[name]
+        for field, size in footprint["intel_fields"].items():
+            intel_fields[field] = intel_fields.get(field, 0) + size
+        sizes.append((footprint["total"], session_id, meta, footprint))
+
+    total = sum(size for size, _, _, _ in sizes)
+    largest = heapq.nlargest(top, sizes, key=lambda item: item[0])
+    return {
+        "backend": backend,
+        "resident_sessions": len(sizes),
+        "total_bytes": total,
+        "avg_bytes": total // len(sizes) if sizes else 0,
+        "components_bytes": components,
+        "intel_fields_bytes": dict(sorted(intel_fields.items(), key=lambda item: -item[1])),
+        "largest": [
+            {
+                "session_id": session_id,
+                "bytes": size,
+                "turns": meta.turn_count,
+                "history_lines": len(meta.history),
+                "history_bytes": footprint["history"],
+                "intel_bytes": footprint["intel"],
+                "keywords_bytes": footprint["keywords"]
+            }
+            for size, session_id, meta, footprint in largest
+        ]
+    }
+
+
+# ========================
+# 2. TRACEMALLOC SNAPSHOTS
+# ========================
+def _where(frame) -> str:
+    filename = frame.filename
+    if filename.startswith(_PROJECT_DIR):
+        filename = os.path.relpath(filename, _PROJECT_DIR)
+    return f"{filename}:{frame.lineno}"
+
+
+class AllocationTracker:
+    """start -> snapshot (baseline) -> ... -> snapshot (diff against the previous one)"""
+
+    def __init__(self, frames: int = TRACEMALLOC_FRAMES):
+        self.frames = frames
+        self._previous = None
+
+    @property
+    def tracing(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start(self, frames: int = None) -> dict:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames or self.frames)
+            print(f"🧠 TRACEMALLOC ON: {tracemalloc.get_traceback_limit()} frames")
+        self._previous = None
+        return self.stats()
+
+    def stop(self) -> dict:
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+            print("🧠 TRACEMALLOC OFF")
+        self._previous = None
+        return self.stats()
+
+    def snapshot(self, top: int = MEMORY_TOP, group_by: str = "lineno", project_only: bool = True) -> dict:
+        """Top allocation sites; a diff against the previous snapshot when there is one"""
+        if not tracemalloc.is_tracing():
+            raise RuntimeError("tracemalloc is not running")
+        if group_by not in ("lineno", "traceback"):
+            raise ValueError("group_by must be lineno or traceback")
+
+        filters = [
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap*>")
+        ]
+        if project_only:
+            # Keep allocations with any of our frames on the stack
+            filters.append(tracemalloc.Filter(True, os.path.join(_PROJECT_DIR, "*"), all_frames=True))
+        snapshot = tracemalloc.take_snapshot().filter_traces(filters)
+        previous, self._previous = self._previous, snapshot
+
+        def site(stat) -> dict:
+            if group_by == "traceback":
+                return {"traceback": [_where(frame) for frame in stat.traceback]}
+            return {"where": _where(stat.traceback[0])}
+
+        result = self.stats()
+        if previous is None:
+            result["mode"] = "baseline"
+            result["top"] = [
+                {**site(stat), "size_kb": round(stat.size / 1024, 1), "count": stat.count}
+                for stat in snapshot.statistics(group_by)[:top]
+            ]
+        else:
+            result["mode"] = "diff"
+            result["top"] = [
+                {
+                    **site(stat),
+                    "size_kb": round(stat.size / 1024, 1),
+                    "size_diff_kb": round(stat.size_diff / 1024, 1),
+                    "count_diff": stat.count_diff
+                }
+                for stat in snapshot.compare_to(previous, group_by)[:top]
+            ]
+        return result
+
+    def stats(self) -> dict:
+        tracing = tracemalloc.is_tracing()
+        current, peak = tracemalloc.get_traced_memory() if tracing else (0, 0)
+        return {
+            "tracing": tracing,
+            "frames": tracemalloc.get_traceback_limit() if tracing else None,
+            "traced_kb": round(current / 1024, 1),
+            "peak_kb": round(peak / 1024, 1),
+            "has_baseline": self._previous is not None
+        }
@@ -0,0 +1,148 @@
+"""
+Metrics - Prometheus text-format metrics without extra dependencies
+Histograms / counters are recorded in-process (a bisect + two adds per
+observation); scrape-time metrics read existing stats only when /metrics
+is fetched, so they cost nothing on the request path.
+"""
+
+from bisect import bisect_left
+
+# Latency buckets (seconds) - from sub-ms regex stages up to model timeouts
+LATENCY_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def latency_summary(samples, digits: int = 1) -> dict:
+    """p50 / p95 / max in ms of a window of second samples (for /health and /stats)"""
+    recent = sorted(samples)
+    if not recent:
+        return {"p50": None, "p95": None, "max": None}
+    return {
+        "p50": round(recent[len(recent) // 2] * 1000, digits),
+        "p95": round(recent[int(len(recent) * 0.95)] * 1000, digits),
+        "max": round(recent[-1] * 1000, digits)
+    }
+
+
+def _labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """One histogram family; observe(value, label) with a single label value"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, label: str = None, buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = (label,) if label else ()
+        self.buckets = tuple(buckets)
+        self._series = {}  # label value -> [bucket counts..., +Inf count, sum]
+
+    def observe(self, value: float, label: str = ""):
+        series = self._series.get(label)
+        if series is None:
+            series = self._series[label] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def samples(self):
+        for label, series in self._series.items():
+            values = (label,) if self.labelnames else ()
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series):
+                cumulative += count
+                yield f"{self.name}_bucket", _labels(self.labelnames, values, f'le="{_number(bound)}"'), cumulative
+            yield f"{self.name}_sum", _labels(self.labelnames, values), series[-1]
+            yield f"{self.name}_count", _labels(self.labelnames, values), cumulative
+
+
+class Counter:
+    """Monotonic counter family with at most one label"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, label: str = None):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = (label,) if label else ()
+        self._values = {}
+
+    def inc(self, label: str = "", amount: float = 1):
+        self._values[label] = self._values.get(label, 0) + amount
+
+    def samples(self):
+        for label, value in self._values.items():
+            yield self.name, _labels(self.labelnames, (label,) if self.labelnames else ()), value
+
+
+class Sampled:
+    """Counter / gauge read from existing stats at scrape time: fn() -> number or {label: number}"""
+
+    def __init__(self, name: str, help_text: str, kind: str, fn, label: str = None):
+        self.name = name
+        self.help_text = help_text
+        self.kind = kind
+        self.fn = fn
+        self.labelnames = (label,) if label else ()
+
+    def samples(self):
+        value = self.fn()
+        if isinstance(value, dict):
+            for label, number in value.items():
+                yield self.name, _labels(self.labelnames, (label,)), number
+        elif value is not None:
+            yield self.name, "", value
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            try:
+                samples = list(metric.samples())
+            except Exception as e:
+                print(f"❌ METRICS ERROR: {metric.name} - {e}")
+                continue
+            lines.append(f"# HELP {metric.name} {metric.help_text}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in samples:
+                lines.append(f"{name}{labels} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+# ========================
+# Process-wide metrics (the request path records into these)
+# ========================
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "honeypot_stage_seconds", "Time spent per pipeline stage", label="stage"
+))
+REQUEST_SECONDS = REGISTRY.register(Histogram(
+    "honeypot_request_seconds", "End-to-end request handling time", label="endpoint"
+))
+SCAMS_DETECTED = REGISTRY.register(Counter(
+    "honeypot_scams_detected_total", "Sessions flagged as scam"
+))
@@ -0,0 +1,149 @@
+"""
+Profiler - on-demand cProfile capture on a live instance
+An admin call switches the profiler on for the next N turns or T seconds
+(whichever comes first). It then switches itself off, writes a .pstats
+dump (open with snakeviz / flameprof / pstats) and keeps a report of the
+hottest functions and of the detector / extractor / post-processing
+stages. The event loop runs on one thread, so every concurrent request in
+the window is captured.
+"""
+
+import asyncio
+import cProfile
+import os
+import pstats
+import time
+from datetime import datetime
+
+# ========================
+# Tuning
+# ========================
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "300"))  # hard cap per capture
+PROFILE_TOP = int(os.getenv("PROFILE_TOP", "15"))  # functions listed in the report
+
+# Pipeline functions we want broken out by name (function name -> stage)
+HOTSPOTS = {
+    "scan_keywords": "detector",
+    "detect_language_style": "detector",
+    "detect_scam_advanced": "detector",
+    "detect_user_region": "detector",
+    "extract_intelligence_advanced": "extractor",
+    "sanitize": "postprocess",
+    "trim": "postprocess",
+    "feed": "postprocess",
+    "add_human_touches": "postprocess"
+}
+
+_PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def _label(key: tuple) -> str:
+    filename, line, name = key
+    if filename.startswith(_PROJECT_DIR):
+        filename = os.path.relpath(filename, _PROJECT_DIR)
+    return f"{filename}:{line}({name})"
+
+
+class RequestProfiler:
+    """One capture at a time; request_done() is a no-op while idle"""
+
+    def __init__(self, directory: str = PROFILE_DIR, max_seconds: float = PROFILE_MAX_SECONDS, top: int = PROFILE_TOP):
+        self.directory = directory
+        self.max_seconds = max_seconds
+        self.top = top
+        self._profile = None
+        self._timer = None
+        self._started = 0.0
+        self._max_requests = 0
+        self.requests_seen = 0
+        self.last_report = None
+
+    @property
+    def active(self) -> bool:
+        return self._profile is not None
+
+    def start(self, requests: int = 0, seconds: float = 0) -> dict:
+        """Profile the next `requests` turns and / or `seconds` (0 = no limit, capped by max_seconds)"""
+        if self.active:
+            raise RuntimeError("a profile is already running")
+        seconds = min(seconds, self.max_seconds) if seconds > 0 else self.max_seconds
+        self._max_requests = max(0, requests)
+        self.requests_seen = 0
+        self._started = time.perf_counter()
+        self._timer = asyncio.get_running_loop().call_later(seconds, self.stop, "time")
+        # CPU time of the loop thread - time parked in epoll isn't a hot spot
+        self._profile = cProfile.Profile(time.thread_time)
+        self._profile.enable()
+        print(f"🔬 PROFILER ON: {requests or 'any'} requests / {seconds:g}s")
+        return self.status()
+
+    def request_done(self):
+        if self._profile is None:
+            return
+        self.requests_seen += 1
+        if self._max_requests and self.requests_seen >= self._max_requests:
+            self.stop("requests")
+
+    def stop(self, reason: str = "manual"):
+        """Switch off, dump and build the report; None when nothing was running"""
+        profile = self._profile
+        if profile is None:
+            return None
+        profile.disable()
+        self._profile = None
+        self._timer.cancel()
+
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"honeypot-{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}.pstats")
+        profile.dump_stats(path)
+
+        self.last_report = self._report(pstats.Stats(profile), path, reason)
+        print(f"🔬 PROFILER OFF ({reason}): {self.requests_seen} requests -> {path}")
+        return self.last_report
+
+    def _report(self, stats: pstats.Stats, path: str, reason: str) -> dict:
+        # stats.stats: (file, line, name) -> (primitive calls, calls, own time, cumulative time, callers)
+        entries = stats.stats
+        stages = {}
+        functions = []
+        for key, (_, calls, own, cumulative, _) in entries.items():
+            stage = HOTSPOTS.get(key[2]) if key[0].startswith(_PROJECT_DIR) else None
+            if stage is None:
+                continue
+            functions.append({
+                "function": _label(key),
+                "stage": stage,
+                "calls": calls,
+                "cumulative_ms": round(cumulative * 1000, 2),
+                "per_call_us": round(cumulative / calls * 1e6, 1) if calls else None
+            })
+            # Nested hotspots (detect_* -> scan_keywords) would double count
+            if not any(HOTSPOTS.get(caller[2]) == stage for caller in entries[key][4]):
+                stages[stage] = stages.get(stage, 0.0) + cumulative
+
+        ranked = sorted(stages.items(), key=lambda item: -item[1])
+        top = sorted(entries.items(), key=lambda item: item[1][2], reverse=True)[:self.top]
+        return {
+            "file": path,
+            "stopped_by": reason,
+            "requests": self.requests_seen,
+            "seconds": round(time.perf_counter() - self._started, 2),
+            "profiled_cpu_ms": round(stats.total_tt * 1000, 2),
+            "dominant_stage": ranked[0][0] if ranked else None,
+            "stages_ms": {stage: round(total * 1000, 2) for stage, total in ranked},
+            "pipeline_functions": sorted(functions, key=lambda f: -f["cumulative_ms"]),
+            "top_own_time": [
+                {"function": _label(key), "calls": calls, "own_ms": round(own * 1000, 2), "cumulative_ms": round(cumulative * 1000, 2)}
+                for key, (_, calls, own, cumulative, _) in top
+            ]
+        }
+
+    def status(self) -> dict:
+        return {
+            "active": self.active,
+            "requests_seen": self.requests_seen,
+            "max_requests": self._max_requests or None,
+            "running_s": round(time.perf_counter() - self._started, 2) if self.active else None,
+            "last_report": self.last_report
+        }
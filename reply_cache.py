@@ -0,0 +1,104 @@
+"""
+Reply Cache - skip the model for scripted scammer lines we have answered before
+Keyed on the normalized scammer message + persona inputs; each key keeps a few
+model replies and serves them in rotation so answers don't repeat word for word
+"""
+
+import os
+import re
+import time
+from collections import OrderedDict
+
+# ========================
+# Tuning
+# ========================
+REPLY_CACHE_ENABLED = os.getenv("REPLY_CACHE_ENABLED", "1") == "1"
+REPLY_CACHE_SIZE = int(os.getenv("REPLY_CACHE_SIZE", "5000"))
+REPLY_CACHE_TTL_SECONDS = float(os.getenv("REPLY_CACHE_TTL_SECONDS", "21600"))
+REPLY_CACHE_VARIANTS = int(os.getenv("REPLY_CACHE_VARIANTS", "3"))  # model replies collected before serving
+
+_NON_WORD_RE = re.compile(r"[^\w\s]+")
+_DIGITS_RE = re.compile(r"\d+")
+_SPACES_RE = re.compile(r"\s+")
+
+
+def normalize_message(text: str) -> str:
+    """Near-exact repeats map to one key: case, punctuation, spacing and numbers ignored"""
+    text = _NON_WORD_RE.sub(" ", text.lower())
+    text = _DIGITS_RE.sub("#", text)
+    return _SPACES_RE.sub(" ", text).strip()
+
+
+class ReplyCache:
+    """LRU + TTL map of key -> rotating reply variants"""
+
+    def __init__(
+        self,
+        max_entries: int = REPLY_CACHE_SIZE,
+        ttl_seconds: float = REPLY_CACHE_TTL_SECONDS,
+        variants: int = REPLY_CACHE_VARIANTS,
+        enabled: bool = REPLY_CACHE_ENABLED,
+        clock=time.monotonic
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.variants = max(1, variants)
+        self.enabled = enabled
+        self.clock = clock
+        self._entries = OrderedDict()  # key -> [created, [replies], next index, model replies seen]
+
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+        self.expired = 0
+
+    @staticmethod
+    def key(message: str, scam_type: str, language_style: str, user_region: str, stage: str) -> tuple:
+        return (normalize_message(message), scam_type, language_style, user_region, stage)
+
+    def get(self, key: tuple):
+        """Next variant in rotation, None until enough model replies were collected"""
+        if not self.enabled:
+            return None
+        entry = self._entries.get(key)
+        if entry is not None and self.clock() - entry[0] > self.ttl_seconds:
+            del self._entries[key]
+            self.expired += 1
+            entry = None
+        if entry is None or entry[3] < self.variants:
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        replies, index = entry[1], entry[2]
+        entry[2] = (index + 1) % len(replies)
+        return replies[index]
+
+    def put(self, key: tuple, reply: str):
+        """Remember a model reply (replies quoting numbers are too specific to reuse)"""
+        if not self.enabled or not reply or _DIGITS_RE.search(reply):
+            return
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = self._entries[key] = [self.clock(), [], 0, 0]
+        self._entries.move_to_end(key)
+        entry[3] += 1
+        if reply not in entry[1] and len(entry[1]) < self.variants:
+            entry[1].append(reply)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evicted += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evicted": self.evicted,
+            "expired": self.expired
+        }
@@ -0,0 +1,122 @@
+"""
+Reply Pipeline - post-processing of every model reply, compiled once
+Script filter (translate table), banned words (one alternation regex),
+whitespace, then a single trim pass to N sentences / max length.
+"""
+
+import os
+import re
+
+# ========================
+# Configuration
+# ========================
+DEFAULT_BAN_WORDS = (
+    "salary", "rent", "mummy", "papa", "fees", "bp",
+    "tension", "savings", "family", "bacha", "health",
+    "income", "loan", "emi", "daughter", "son"
+)
+
+REPLY_STAGES = tuple(s.strip() for s in os.getenv("REPLY_STAGES", "script,ban_words,trim").split(",") if s.strip())
+REPLY_BAN_WORDS = tuple(
+    w.strip() for w in os.getenv("REPLY_BAN_WORDS", ",".join(DEFAULT_BAN_WORDS)).split(",") if w.strip()
+)
+REPLY_MAX_LEN = int(os.getenv("REPLY_MAX_LEN", "150"))
+REPLY_MAX_SENTENCES = int(os.getenv("REPLY_MAX_SENTENCES", "2"))
+
+STAGES = ("script", "ban_words", "trim")
+
+_SPACES_RE = re.compile(r"\s+")
+_SENTENCE_BREAK_RE = re.compile(r"(?<=[.!?])\s+")
+_SENTENCE_END_RE = re.compile(r"[.!?](?=\s|$)")
+
+
+class _ScriptTable(dict):
+    """str.translate table: ASCII + Devanagari kept, everything else dropped (filled lazily)"""
+
+    def __missing__(self, code):
+        self[code] = code if code < 128 or 0x0900 <= code <= 0x097F else None
+        return self[code]
+
+
+class ReplyPipeline:
+    """sanitize() is safe on any run of complete words, trim() runs once on the result"""
+
+    def __init__(
+        self,
+        stages=REPLY_STAGES,
+        ban_words=REPLY_BAN_WORDS,
+        max_len: int = REPLY_MAX_LEN,
+        max_sentences: int = REPLY_MAX_SENTENCES
+    ):
+        unknown = set(stages) - set(STAGES)
+        if unknown:
+            raise ValueError(f"Unknown reply stages: {', '.join(sorted(unknown))}")
+        self.stages = tuple(stages)
+        self.max_len = max_len
+        self.max_sentences = max_sentences
+        self._script = _ScriptTable() if "script" in stages else None
+        self._ban = None
+        if "ban_words" in stages and ban_words:
+            alternation = "|".join(re.escape(w) for w in sorted(ban_words, key=len, reverse=True))
+            self._ban = re.compile(rf"\b(?:{alternation})\b", re.IGNORECASE)
+        self._trim = "trim" in stages
+
+    def sanitize(self, text: str) -> str:
+        """Script filter + banned words + whitespace"""
+        if self._script is not None and not text.isascii():
+            text = text.translate(self._script)
+        if self._ban is not None:
+            text = self._ban.sub("", text)
+        return _SPACES_RE.sub(" ", text).strip()
+
+    def trim(self, text: str) -> str:
+        """First max_sentences sentences, then cut to max_len at the last sentence end / word"""
+        if not self._trim:
+            return text
+
+        count = 0
+        for m in _SENTENCE_BREAK_RE.finditer(text):
+            count += 1
+            if count == self.max_sentences:
+                text = text[:m.start()]
+                break
+
+        if len(text) > self.max_len:
+            cut = text[:self.max_len]
+            end = max(cut.rfind("."), cut.rfind("!"), cut.rfind("?"))
+            text = cut[:end + 1] if end >= 0 else cut.rsplit(" ", 1)[0]
+
+        return text
+
+    def __call__(self, text: str) -> str:
+        return self.trim(self.sanitize(text))
+
+    def complete(self, clean: str) -> bool:
+        """Enough sanitized text that trim() won't need more"""
+        if not self._trim:
+            return False
+        return len(clean) >= self.max_len or len(_SENTENCE_END_RE.findall(clean)) >= self.max_sentences
+
+    def stream(self) -> "ReplyStream":
+        return ReplyStream(self)
+
+
+class ReplyStream:
+    """Sanitizes a streamed reply chunk by chunk; feed() is True once the pipeline has enough"""
+
+    def __init__(self, pipeline: ReplyPipeline):
+        self.pipeline = pipeline
+        self.clean = ""
+        self.pending = ""  # trailing partial word - a banned word may span chunks
+
+    def feed(self, chunk: str) -> bool:
+        self.pending += chunk
+        cut = max(self.pending.rfind(" "), self.pending.rfind("\n"), self.pending.rfind("\t"))
+        if cut < 0:
+            return False
+        self.clean = f"{self.clean} {self.pipeline.sanitize(self.pending[:cut])}".strip()
+        self.pending = self.pending[cut:]
+        return self.pipeline.complete(self.clean)
+
+    def text(self) -> str:
+        return self.pipeline.trim(f"{self.clean} {self.pipeline.sanitize(self.pending)}".strip())
@@ -0,0 +1,92 @@
+"""
+Session State - one conversation in a compact __slots__ object
+Replaces the per-session dict: fixed attributes instead of a hash table
+per session, repeated small strings (region, language, scam type,
+keywords) interned so every session points at one copy, and a scalar row
+for the session stores to persist. History, intel and keywords live on
+the same object and are persisted as per-turn deltas.
+"""
+
+import os
+import sys
+
+from intel_store import IntelStore, OrderedSet, KEYWORD_CAP
+
+HISTORY_MARKS_KEEP = int(os.getenv("HISTORY_MARKS_KEEP", "32"))  # hashes of the latest ingested messages
+
+# Plain per-session values, stored as one row / hash (everything except history / intel / keywords)
+SCALAR_FIELDS = (
+    "submitted", "scam_detected", "scam_type", "language_style", "user_region", "turn_count", "history_marks"
+)
+
+_intern = sys.intern
+
+
+class SessionState:
+    """State of one session; what a store's load() returns and commit_turn() persists"""
+
+    __slots__ = (
+        "submitted",
+        "scam_detected",
+        "scam_type",
+        "language_style",
+        "user_region",
+        "turn_count",
+        "history_marks",
+        "history",
+        "intel",
+        "keywords"
+    )
+
+    def __init__(self, language_style: str, user_region: str, history: list = None):
+        self.submitted = False
+        self.scam_detected = False
+        self.scam_type = "unknown"
+        self.language_style = _intern(language_style)
+        self.user_region = _intern(user_region)  # SET ONCE, NEVER CHANGES
+        self.turn_count = 0
+        self.history_marks = []  # message_mark() of the latest messages already ingested
+        self.history = history or []
+        self.intel = IntelStore()
+        self.keywords = OrderedSet(cap=KEYWORD_CAP)
+
+    def remember_marks(self, marks: list):
+        """Keep the latest HISTORY_MARKS_KEEP message marks"""
+        if marks:
+            self.history_marks = (self.history_marks + marks)[-HISTORY_MARKS_KEEP:]
+
+    def to_row(self) -> dict:
+        """Scalar fields as stored by the SQLite / Redis backends"""
+        return {
+            "submitted": int(self.submitted),
+            "scam_detected": int(self.scam_detected),
+            "scam_type": self.scam_type,
+            "language_style": self.language_style,
+            "user_region": self.user_region,
+            "turn_count": self.turn_count,
+            "history_marks": ",".join(self.history_marks)
+        }
+
+    def apply_row(self, values: dict):
+        """Inverse of to_row(); strings read back are interned again"""
+        self.submitted = values["submitted"] in (1, "1", True)
+        self.scam_detected = values["scam_detected"] in (1, "1", True)
+        self.scam_type = _intern(values["scam_type"])
+        self.language_style = _intern(values["language_style"])
+        self.user_region = _intern(values["user_region"])
+        self.turn_count = int(values["turn_count"])
+        marks = values.get("history_marks")
+        self.history_marks = marks.split(",") if marks else []
+
+    def add_item(self, field: str, value: str):
+        """One persisted intel / keyword row"""
+        if field == "keywords":
+            self.keywords.add(_intern(value))
+        else:
+            self.intel.add(field, value)
+
+    def __repr__(self):
+        return (
+            f"SessionState(turns={self.turn_count}, scam={self.scam_detected}/{self.scam_type}, "
+            f"language={self.language_style}, region={self.user_region}, history={len(self.history)})"
+        )
@@ -0,0 +1,1015 @@
+"""
+Session Store - where per-session state lives
+In-memory (single worker), SQLite WAL or Redis-protocol (shared by all workers)
+Bounded by max sessions + idle TTL; evicted sessions are handed to a callback first
+The API is async: shared backends do their blocking I/O on one worker thread
+per store, never on the event loop.
+"""
+
+import asyncio
+import hashlib
+import os
+import select
+import socket
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from urllib.parse import urlparse, unquote
+
+from intel_store import INTEL_FIELDS
+from metrics import latency_summary
+from session_state import SessionState, SCALAR_FIELDS
+
+# ========================
+# Limits & Backend Selection
+# ========================
+SESSION_MAX = int(os.getenv("SESSION_MAX", "10000"))
+SESSION_TTL_SECONDS = float(os.getenv("SESSION_TTL_SECONDS", "3600"))
+SESSION_SWEEP_SECONDS = float(os.getenv("SESSION_SWEEP_SECONDS", "60"))
+SESSION_CACHE_SIZE = int(os.getenv("SESSION_CACHE_SIZE", "2000"))  # per-process cache of shared backends
+SESSION_TOTALS_SECONDS = float(os.getenv("SESSION_TOTALS_SECONDS", "10"))  # /stats aggregates reused this long
+
+# memory | sqlite:///sessions.db | redis://[:password@]host:port/db
+# Anything but memory lets uvicorn run with --workers N (or WEB_CONCURRENCY)
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "memory")
+
+
+def message_mark(sender: str, text: str, timestamp) -> str:
+    """Stable short hash of one conversation message (same in every worker)"""
+    raw = f"{sender.lower()}\x00{text.strip()}\x00{timestamp}".encode("utf-8", "surrogatepass")
+    return hashlib.blake2b(raw, digest_size=8).hexdigest()
+
+
+def unseen_messages(history: list, marks: list) -> list:
+    """
+    Messages of a client-sent conversationHistory not ingested yet, oldest first
+    Walks back from the newest message and stops at the first known one, so a
+    turn costs O(new messages) however long the resent history is
+    """
+    known = set(marks)
+    new = []
+    for message in reversed(history):
+        mark = message_mark(message.get("sender", ""), message.get("text", ""), message.get("timestamp"))
+        if mark in known:
+            break
+        new.append((mark, message))
+    new.reverse()
+    return new
+
+
+def _empty_totals() -> dict:
+    return {
+        "total_sessions": 0,
+        "scams_detected": 0,
+        "submitted": 0,
+        "intel": {field: 0 for field in INTEL_FIELDS}
+    }
+
+
+class SessionBackend:
+    """
+    Interface of every session store
+    A turn is: await load -> (await create if None) -> mutate meta -> await commit_turn(delta)
+    delta = {"history": [new lines], "intel": {field: [new values]}, "keywords": [new keywords]}
+    """
+
+    async def load(self, session_id: str):
+        """SessionState, None if unknown or expired"""
+        raise NotImplementedError
+
+    async def create(self, session_id: str, meta: SessionState):
+        """Store a brand new session"""
+        raise NotImplementedError
+
+    async def commit_turn(self, session_id: str, meta: SessionState, delta: dict):
+        """
+        Persist only what this turn changed: delta = {"history", "intel", "keywords", "turns"}
+        Shared stores add "turns" to turn_count and never clear submitted / scam_detected,
+        then refresh those on meta - another worker's turn may have landed since the load
+        """
+        raise NotImplementedError
+
+    async def sweep(self) -> int:
+        """Evict expired / over-cap sessions, returns how many went"""
+        raise NotImplementedError
+
+    async def totals(self) -> dict:
+        """Aggregates for /stats"""
+        raise NotImplementedError
+
+    def stats(self) -> dict:
+        """Counters only - never touches the backend (live_sessions may be a little stale)"""
+        raise NotImplementedError
+
+    def resident(self) -> list:
+        """(sessionId, meta) of the sessions held in this process's memory"""
+        raise NotImplementedError
+
+    async def inspect(self, fn):
+        """fn(resident()) while no store call can change those sessions (for memory reports)"""
+        return fn(self.resident())
+
+    def __len__(self):
+        raise NotImplementedError
+
+
+# ========================
+# 1. IN-MEMORY (single worker)
+# ========================
+class MemorySessionStore(SessionBackend):
+    """
+    sessionId -> session record, least recently used first
+    Idle order == LRU order, so expired sessions always sit at the front
+    """
+
+    def __init__(
+        self,
+        max_sessions: int = SESSION_MAX,
+        ttl_seconds: float = SESSION_TTL_SECONDS,
+        on_evict=None,
+        clock=time.monotonic
+    ):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.on_evict = on_evict  # on_evict(session_id, record, reason) -> True if it finalized the session
+        self.clock = clock
+        self._records = OrderedDict()  # sessionId -> (last_seen, record)
+        self.evicted = {"lru": 0, "ttl": 0}
+        self.finalized_on_evict = 0
+
+    def get(self, session_id: str):
+        """Fetch and mark as recently used, None if missing or expired"""
+        self._sweep()
+        entry = self._records.get(session_id)
+        if entry is None:
+            return None
+        self._records[session_id] = (self.clock(), entry[1])
+        self._records.move_to_end(session_id)
+        return entry[1]
+
+    def put(self, session_id: str, record):
+        """Insert / replace, evicting least recently used sessions over the cap"""
+        self._sweep()
+        self._records[session_id] = (self.clock(), record)
+        self._records.move_to_end(session_id)
+        while len(self._records) > self.max_sessions:
+            oldest = next(iter(self._records))
+            self._evict(oldest, "lru")
+
+    async def load(self, session_id: str):
+        return self.get(session_id)
+
+    async def create(self, session_id: str, meta: SessionState):
+        self.put(session_id, meta)
+
+    async def commit_turn(self, session_id: str, meta: SessionState, delta: dict):
+        """Records are live objects here - nothing to write"""
+
+    async def sweep(self) -> int:
+        return self._sweep()
+
+    def _sweep(self) -> int:
+        """Evict idle sessions past the TTL, returns how many went"""
+        if not self.ttl_seconds:
+            return 0
+        cutoff = self.clock() - self.ttl_seconds
+        count = 0
+        while self._records:
+            session_id, (last_seen, _) = next(iter(self._records.items()))
+            if last_seen > cutoff:
+                break
+            self._evict(session_id, "ttl")
+            count += 1
+        return count
+
+    def _evict(self, session_id: str, reason: str):
+        _, record = self._records.pop(session_id)
+        self.evicted[reason] += 1
+        if self.on_evict is not None:
+            try:
+                if self.on_evict(session_id, record, reason):
+                    self.finalized_on_evict += 1
+            except Exception as e:
+                print(f"❌ SESSION EVICT ERROR: {session_id} - {e}")
+
+    def values(self):
+        return [record for _, record in self._records.values()]
+
+    def resident(self) -> list:
+        return [(session_id, record) for session_id, (_, record) in self._records.items()]
+
+    async def totals(self) -> dict:
+        totals = _empty_totals()
+        for meta in self.values():
+            totals["total_sessions"] += 1
+            totals["scams_detected"] += bool(meta.scam_detected)
+            totals["submitted"] += bool(meta.submitted)
+            for field in INTEL_FIELDS:
+                totals["intel"][field] += meta.intel.count(field)
+        return totals
+
+    def stats(self) -> dict:
+        return {
+            "backend": "memory",
+            "live_sessions": len(self._records),
+            "max_sessions": self.max_sessions,
+            "ttl_seconds": self.ttl_seconds,
+            "evicted_lru": self.evicted["lru"],
+            "evicted_ttl": self.evicted["ttl"],
+            "finalized_on_evict": self.finalized_on_evict
+        }
+
+    def __contains__(self, session_id: str):
+        return session_id in self._records
+
+    def __len__(self):
+        return len(self._records)
+
+
+# ========================
+# 2. SHARED BACKENDS - common part
+# ========================
+class _SharedSessionStore(SessionBackend):
+    """
+    Base for stores shared between worker processes
+    Each process keeps recently used sessions in a small cache together with
+    cursors (how much history / intel it has already read), so a turn only
+    fetches what other workers appended since - never the whole session.
+    Subclasses implement blocking _load / _create / _commit_turn / _sweep /
+    _read_totals; those run one at a time on the store's own thread (one
+    connection, never used concurrently, even when a caller is cancelled).
+    Counters in stats() are per process.
+    """
+
+    backend_name = "shared"
+
+    def __init__(self, max_sessions: int, ttl_seconds: float, on_evict, cache_size: int):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.on_evict = on_evict
+        self.cache_size = cache_size
+        self._cache = OrderedDict()  # sessionId -> [meta, cursor]
+        self._io = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"{self.backend_name}-store")
+        self._evicted = deque()  # (sessionId, meta, reason) claimed on the thread, handed to on_evict on the loop
+        self._totals = None  # (monotonic time, totals)
+        self.live_sessions = None  # as of the last count (create / sweep)
+        self.evicted = {"lru": 0, "ttl": 0}
+        self.finalized_on_evict = 0
+        self.incremental_loads = 0
+        self.full_loads = 0
+
+    async def _call(self, fn, *args):
+        """Blocking backend call on the store thread; evicted sessions are finalized back on the loop"""
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._io, fn, *args)
+        finally:
+            while self._evicted:
+                self._hand_over(*self._evicted.popleft())
+
+    async def load(self, session_id: str):
+        return await self._call(self._load, session_id)
+
+    async def create(self, session_id: str, meta: SessionState):
+        await self._call(self._create, session_id, meta)
+
+    async def commit_turn(self, session_id: str, meta: SessionState, delta: dict):
+        await self._call(self._commit_turn, session_id, meta, delta)
+
+    async def sweep(self) -> int:
+        return await self._call(self._sweep)
+
+    async def totals(self) -> dict:
+        """Backend-wide aggregates, reused for SESSION_TOTALS_SECONDS"""
+        now = time.monotonic()
+        if self._totals is None or now - self._totals[0] >= SESSION_TOTALS_SECONDS:
+            self._totals = (now, await self._call(self._read_totals))
+        return self._totals[1]
+
+    def _count(self) -> int:
+        self.live_sessions = len(self)
+        return self.live_sessions
+
+    def _cached(self, session_id: str):
+        entry = self._cache.get(session_id)
+        if entry is not None:
+            self._cache.move_to_end(session_id)
+        return entry
+
+    def _remember(self, session_id: str, meta: SessionState, cursor):
+        self._cache[session_id] = [meta, cursor]
+        self._cache.move_to_end(session_id)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def _forget(self, session_id: str):
+        self._cache.pop(session_id, None)
+
+    def resident(self) -> list:
+        """Only the per-process cache - the rest lives in the shared backend"""
+        return [(session_id, entry[0]) for session_id, entry in self._cache.items()]
+
+    async def inspect(self, fn):
+        """
+        The store thread loads into cached sessions, so it is parked first; fn
+        then runs on the loop without awaiting - turns can't touch them either
+        """
+        loop = asyncio.get_running_loop()
+        parked = loop.create_future()
+        release = threading.Event()
+
+        def park():
+            loop.call_soon_threadsafe(lambda: parked.done() or parked.set_result(None))
+            release.wait()
+
+        loop.run_in_executor(self._io, park)
+        try:
+            await parked
+            return fn(self.resident())
+        finally:
+            release.set()
+
+    @staticmethod
+    def _apply_counters(meta: SessionState, submitted, scam_detected, turn_count):
+        """Stored values after an atomic commit (ints from SQLite, strings from Redis)"""
+        meta.submitted = submitted in (1, "1")
+        meta.scam_detected = scam_detected in (1, "1")
+        meta.turn_count = int(turn_count)
+
+    def _expired(self, last_seen: float) -> bool:
+        return bool(self.ttl_seconds) and last_seen <= time.time() - self.ttl_seconds
+
+    def _finalize(self, session_id: str, meta: SessionState, reason: str):
+        """On the store thread: the claim is ours, on_evict runs once the call returns"""
+        self.evicted[reason] += 1
+        self._forget(session_id)
+        if meta is not None:
+            self._evicted.append((session_id, meta, reason))
+
+    def _hand_over(self, session_id: str, meta: SessionState, reason: str):
+        if self.on_evict is not None:
+            try:
+                if self.on_evict(session_id, meta, reason):
+                    self.finalized_on_evict += 1
+            except Exception as e:
+                print(f"❌ SESSION EVICT ERROR: {session_id} - {e}")
+
+    def stats(self) -> dict:
+        return {
+            "backend": self.backend_name,
+            "live_sessions": self.live_sessions,
+            "max_sessions": self.max_sessions,
+            "ttl_seconds": self.ttl_seconds,
+            "evicted_lru": self.evicted["lru"],
+            "evicted_ttl": self.evicted["ttl"],
+            "finalized_on_evict": self.finalized_on_evict,
+            "cached_sessions": len(self._cache),
+            "incremental_loads": self.incremental_loads,
+            "full_loads": self.full_loads
+        }
+
+
+# ========================
+# 3. SQLITE (WAL) - shared by workers on one box
+# ========================
+class SqliteSessionStore(_SharedSessionStore):
+    """
+    One row per session + append-only history / intel rows
+    History rows carry a per-session seq so a worker can read "seq > what I have"
+    """
+
+    backend_name = "sqlite"
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS sessions (
+        session_id TEXT PRIMARY KEY,
+        last_seen REAL NOT NULL,
+        submitted INTEGER NOT NULL,
+        scam_detected INTEGER NOT NULL,
+        scam_type TEXT NOT NULL,
+        language_style TEXT NOT NULL,
+        user_region TEXT NOT NULL,
+        turn_count INTEGER NOT NULL,
+        history_marks TEXT NOT NULL DEFAULT ''
+    );
+    CREATE INDEX IF NOT EXISTS sessions_last_seen ON sessions (last_seen);
+    CREATE TABLE IF NOT EXISTS session_history (
+        session_id TEXT NOT NULL,
+        seq INTEGER NOT NULL,
+        line TEXT NOT NULL,
+        PRIMARY KEY (session_id, seq)
+    );
+    CREATE TABLE IF NOT EXISTS session_intel (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        session_id TEXT NOT NULL,
+        field TEXT NOT NULL,
+        value TEXT NOT NULL,
+        UNIQUE (session_id, field, value)
+    );
+    CREATE INDEX IF NOT EXISTS session_intel_by_session ON session_intel (session_id, id);
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_sessions: int = SESSION_MAX,
+        ttl_seconds: float = SESSION_TTL_SECONDS,
+        on_evict=None,
+        cache_size: int = SESSION_CACHE_SIZE
+    ):
+        super().__init__(max_sessions, ttl_seconds, on_evict, cache_size)
+        self.path = path
+        self.db = sqlite3.connect(path, timeout=10, isolation_level=None, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(self.SCHEMA)
+        columns = {row[1] for row in self.db.execute("PRAGMA table_info(sessions)")}
+        if "history_marks" not in columns:
+            # Databases created before history ingestion
+            self.db.execute("ALTER TABLE sessions ADD COLUMN history_marks TEXT NOT NULL DEFAULT ''")
+
+    def _load(self, session_id: str):
+        row = self.db.execute(
+            "SELECT last_seen, submitted, scam_detected, scam_type, language_style, user_region, turn_count, "
+            "history_marks FROM sessions WHERE session_id = ?",
+            (session_id,)
+        ).fetchone()
+        if row is None:
+            self._forget(session_id)
+            return None
+        if self._expired(row[0]):
+            self._evict(session_id, "ttl", row[0])
+            return None
+        self.db.execute("UPDATE sessions SET last_seen = ? WHERE session_id = ?", (time.time(), session_id))
+
+        entry = self._cached(session_id)
+        if entry is None:
+            self.full_loads += 1
+            meta = SessionState(row[4], row[5])
+            cursor = {"history": 0, "intel": 0}
+        else:
+            self.incremental_loads += 1
+            meta, cursor = entry
+
+        meta.apply_row(dict(zip(SCALAR_FIELDS, row[1:])))
+        self._read_new_rows(session_id, meta, cursor)
+        self._remember(session_id, meta, cursor)
+        return meta
+
+    def _read_new_rows(self, session_id: str, meta: SessionState, cursor: dict):
+        for seq, line in self.db.execute(
+            "SELECT seq, line FROM session_history WHERE session_id = ? AND seq > ? ORDER BY seq",
+            (session_id, cursor["history"])
+        ):
+            meta.history.append(line)
+            cursor["history"] = seq
+        for row_id, field, value in self.db.execute(
+            "SELECT id, field, value FROM session_intel WHERE session_id = ? AND id > ? ORDER BY id",
+            (session_id, cursor["intel"])
+        ):
+            meta.add_item(field, value)
+            cursor["intel"] = row_id
+
+    def _create(self, session_id: str, meta: SessionState):
+        values = meta.to_row()
+        with self.db:
+            self.db.execute("BEGIN IMMEDIATE")
+            self._delete_rows(session_id)
+            self.db.execute(
+                "INSERT INTO sessions (session_id, last_seen, submitted, scam_detected, scam_type, "
+                "language_style, user_region, turn_count, history_marks) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (session_id, time.time(), *(values[f] for f in SCALAR_FIELDS))
+            )
+            self.db.executemany(
+                "INSERT INTO session_history (session_id, seq, line) VALUES (?, ?, ?)",
+                [(session_id, seq, line) for seq, line in enumerate(meta.history, 1)]
+            )
+        self._remember(session_id, meta, {"history": len(meta.history), "intel": 0})
+        self._evict_over_cap()
+
+    def _commit_turn(self, session_id: str, meta: SessionState, delta: dict):
+        values = meta.to_row()
+        lines = delta.get("history", [])
+        items = [(field, value) for field, new in delta.get("intel", {}).items() for value in new]
+        items += [("keywords", keyword) for keyword in delta.get("keywords", [])]
+
+        with self.db:
+            self.db.execute("BEGIN IMMEDIATE")
+            # Counters / flags as deltas: another worker's turn may have landed since our load
+            self.db.execute(
+                "UPDATE sessions SET last_seen = ?, submitted = MAX(submitted, ?), "
+                "scam_detected = MAX(scam_detected, ?), scam_type = ?, language_style = ?, user_region = ?, "
+                "turn_count = turn_count + ?, history_marks = ? WHERE session_id = ?",
+                (time.time(), values["submitted"], values["scam_detected"], values["scam_type"],
+                 values["language_style"], values["user_region"], delta.get("turns", 0),
+                 values["history_marks"], session_id)
+            )
+            stored = self.db.execute(
+                "SELECT submitted, scam_detected, turn_count FROM sessions WHERE session_id = ?",
+                (session_id,)
+            ).fetchone()
+            first = self.db.execute(
+                "SELECT COALESCE(MAX(seq), 0) + 1 FROM session_history WHERE session_id = ?",
+                (session_id,)
+            ).fetchone()[0]
+            self.db.executemany(
+                "INSERT INTO session_history (session_id, seq, line) VALUES (?, ?, ?)",
+                [(session_id, first + i, line) for i, line in enumerate(lines)]
+            )
+            self.db.executemany(
+                "INSERT OR IGNORE INTO session_intel (session_id, field, value) VALUES (?, ?, ?)",
+                [(session_id, field, value) for field, value in items]
+            )
+        if stored is not None:
+            self._apply_counters(meta, *stored)
+
+        entry = self._cached(session_id)
+        if entry is not None:
+            cursor = entry[1]
+            if first == cursor["history"] + 1:
+                cursor["history"] += len(lines)
+            else:
+                self._forget(session_id)  # another worker wrote in between - reload fully next turn
+
+    def _delete_rows(self, session_id: str):
+        self.db.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+        self.db.execute("DELETE FROM session_history WHERE session_id = ?", (session_id,))
+        self.db.execute("DELETE FROM session_intel WHERE session_id = ?", (session_id,))
+
+    def _evict(self, session_id: str, reason: str, last_seen: float):
+        """Claim the session (only one worker wins), then finalize it"""
+        self._forget(session_id)
+        meta = SessionState("english", "north_indian")
+        with self.db:
+            self.db.execute("BEGIN IMMEDIATE")
+            row = self.db.execute(
+                "SELECT submitted, scam_detected, scam_type, language_style, user_region, turn_count, "
+                "history_marks FROM sessions WHERE session_id = ? AND last_seen = ?",
+                (session_id, last_seen)
+            ).fetchone()
+            if row is None:
+                return  # touched or already evicted by another worker
+            meta.apply_row(dict(zip(SCALAR_FIELDS, row)))
+            self._read_new_rows(session_id, meta, {"history": 0, "intel": 0})
+            self._delete_rows(session_id)
+        self._finalize(session_id, meta, reason)
+
+    def _evict_over_cap(self) -> int:
+        over = self._count() - self.max_sessions
+        if over <= 0:
+            return 0
+        rows = self.db.execute(
+            "SELECT session_id, last_seen FROM sessions ORDER BY last_seen LIMIT ?", (over,)
+        ).fetchall()
+        for session_id, last_seen in rows:
+            self._evict(session_id, "lru", last_seen)
+        self.live_sessions -= len(rows)
+        return len(rows)
+
+    def _sweep(self) -> int:
+        count = 0
+        if self.ttl_seconds:
+            rows = self.db.execute(
+                "SELECT session_id, last_seen FROM sessions WHERE last_seen <= ? ORDER BY last_seen",
+                (time.time() - self.ttl_seconds,)
+            ).fetchall()
+            for session_id, last_seen in rows:
+                self._evict(session_id, "ttl", last_seen)
+            count += len(rows)
+        return count + self._evict_over_cap()
+
+    def _read_totals(self) -> dict:
+        totals = _empty_totals()
+        total, scams, submitted = self.db.execute(
+            "SELECT COUNT(*), COALESCE(SUM(scam_detected), 0), COALESCE(SUM(submitted), 0) FROM sessions"
+        ).fetchone()
+        totals.update(total_sessions=total, scams_detected=scams, submitted=submitted)
+        for field, count in self.db.execute("SELECT field, COUNT(*) FROM session_intel GROUP BY field"):
+            if field in totals["intel"]:
+                totals["intel"][field] = count
+        return totals
+
+    def __len__(self):
+        return self.db.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+
+# ========================
+# 4. REDIS PROTOCOL - shared across boxes
+# ========================
+class RespError(Exception):
+    """Error reply from a Redis-protocol server"""
+
+
+class RespClient:
+    """
+    Minimal blocking RESP2 client - just what the session store needs
+    Works against Redis, Valkey, KeyDB or any local stand-in speaking the protocol
+    """
+
+    def __init__(self, host: str = "localhost", port: int = 6379, db: int = 0, password: str = None, timeout: float = 5.0):
+        self.host = host
+        self.port = port
+        self.db = db
+        self.password = password
+        self.timeout = timeout
+        self._sock = None
+        self._reader = None
+
+    def _connect(self):
+        self._sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._reader = self._sock.makefile("rb")
+        if self.password:
+            self._roundtrip([("AUTH", self.password)])
+        if self.db:
+            self._roundtrip([("SELECT", self.db)])
+
+    def close(self):
+        if self._sock is not None:
+            self._sock.close()
+        self._sock = self._reader = None
+
+    @staticmethod
+    def _encode(args) -> bytes:
+        out = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode()
+            out.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        return b"".join(out)
+
+    def _read_reply(self):
+        line = self._reader.readline()
+        if not line:
+            raise ConnectionError("connection closed by server")
+        kind, body = line[:1], line[1:-2]
+        if kind == b"+":
+            return body.decode()
+        if kind == b"-":
+            return RespError(body.decode())
+        if kind == b":":
+            return int(body)
+        if kind == b"$":
+            size = int(body)
+            if size < 0:
+                return None
+            data = self._reader.read(size + 2)[:-2]
+            return data.decode()
+        if kind == b"*":
+            size = int(body)
+            if size < 0:
+                return None
+            return [self._read_reply() for _ in range(size)]
+        raise RespError(f"unexpected reply type {kind!r}")
+
+    def _roundtrip(self, commands: list) -> list:
+        self._sock.sendall(b"".join(self._encode(cmd) for cmd in commands))
+        replies = [self._read_reply() for _ in commands]
+        for reply in replies:
+            if isinstance(reply, RespError):
+                raise reply
+        return replies
+
+    def _stale(self) -> bool:
+        """An idle connection with something to read has been closed / reset by the server"""
+        try:
+            readable, _, _ = select.select([self._sock], [], [], 0)
+        except (OSError, ValueError):
+            return True
+        return bool(readable)
+
+    def _ensure_connected(self):
+        """(Re)connect before anything is sent - the only point where a retry can't duplicate writes"""
+        if self._sock is not None and self._stale():
+            self.close()
+        if self._sock is not None:
+            return
+        try:
+            self._connect()
+        except (ConnectionError, OSError):
+            self.close()
+            self._connect()
+
+    def pipeline(self, commands: list) -> list:
+        """
+        Send all commands in one write, read all replies (one round trip)
+        Never resent once bytes went out: a lost reply may belong to an applied RPUSH
+        """
+        if not commands:
+            return []
+        self._ensure_connected()
+        try:
+            return self._roundtrip(commands)
+        except (ConnectionError, OSError):
+            self.close()
+            raise
+
+    def execute(self, *args):
+        return self.pipeline([args])[0]
+
+
+class RedisSessionStore(_SharedSessionStore):
+    """
+    Keys per session (prefix hp:):
+      s:{id}          hash  - scalar fields + last_seen
+      s:{id}:history  list  - history lines
+      s:{id}:{field}  list  - intel values / keywords, first seen order
+      sessions        zset  - id scored by last_seen (LRU / TTL index)
+    Lists are append-only, so the cursor is just "how many items I have read"
+    """
+
+    backend_name = "redis"
+    LIST_FIELDS = INTEL_FIELDS + ("keywords",)
+
+    def __init__(
+        self,
+        client: RespClient,
+        prefix: str = "hp:",
+        max_sessions: int = SESSION_MAX,
+        ttl_seconds: float = SESSION_TTL_SECONDS,
+        on_evict=None,
+        cache_size: int = SESSION_CACHE_SIZE
+    ):
+        super().__init__(max_sessions, ttl_seconds, on_evict, cache_size)
+        self.client = client
+        self.prefix = prefix
+        self.index_key = f"{prefix}sessions"
+
+    def _key(self, session_id: str, suffix: str = "") -> str:
+        return f"{self.prefix}s:{session_id}{':' + suffix if suffix else ''}"
+
+    def _all_keys(self, session_id: str) -> list:
+        return [self._key(session_id), self._key(session_id, "history")] + [
+            self._key(session_id, field) for field in self.LIST_FIELDS
+        ]
+
+    def _read(self, session_id: str, meta: SessionState, cursor: dict) -> dict:
+        """One round trip: scalars + everything past the cursors"""
+        commands = [("HGETALL", self._key(session_id)),
+                    ("LRANGE", self._key(session_id, "history"), cursor["history"], -1)]
+        commands += [("LRANGE", self._key(session_id, field), cursor[field], -1) for field in self.LIST_FIELDS]
+        replies = self.client.pipeline(commands)
+        values = self._hash(replies[0])
+        if not values:
+            return values
+        meta.apply_row(values)
+        meta.history.extend(replies[1])
+        cursor["history"] += len(replies[1])
+        for field, new in zip(self.LIST_FIELDS, replies[2:]):
+            for value in new:
+                meta.add_item(field, value)
+            cursor[field] += len(new)
+        return values
+
+    @staticmethod
+    def _hash(reply) -> dict:
+        if not reply:
+            return {}
+        if isinstance(reply, dict):
+            return reply
+        return dict(zip(reply[::2], reply[1::2]))
+
+    @classmethod
+    def _new_cursor(cls) -> dict:
+        cursor = {field: 0 for field in cls.LIST_FIELDS}
+        cursor["history"] = 0
+        return cursor
+
+    def _load(self, session_id: str):
+        entry = self._cached(session_id)
+        if entry is None:
+            meta, cursor = SessionState("english", "north_indian"), self._new_cursor()
+        else:
+            meta, cursor = entry
+        values = self._read(session_id, meta, cursor)
+        if not values:
+            self._forget(session_id)
+            return None
+        if self._expired(float(values["last_seen"])):
+            self._evict(session_id, "ttl", float(values["last_seen"]))
+            return None
+        if entry is None:
+            self.full_loads += 1
+        else:
+            self.incremental_loads += 1
+        now = time.time()
+        self.client.pipeline([
+            ("HSET", self._key(session_id), "last_seen", now),
+            ("ZADD", self.index_key, now, session_id)
+        ])
+        self._remember(session_id, meta, cursor)
+        return meta
+
+    def _scalar_args(self, meta: SessionState, now: float) -> list:
+        args = ["last_seen", now]
+        for field, value in meta.to_row().items():
+            args += [field, value]
+        return args
+
+    def _create(self, session_id: str, meta: SessionState):
+        now = time.time()
+        commands = [("DEL", *self._all_keys(session_id)),
+                    ("HSET", self._key(session_id), *self._scalar_args(meta, now)),
+                    ("ZADD", self.index_key, now, session_id)]
+        if meta.history:
+            commands.append(("RPUSH", self._key(session_id, "history"), *meta.history))
+        self.client.pipeline(commands)
+        cursor = self._new_cursor()
+        cursor["history"] = len(meta.history)
+        self._remember(session_id, meta, cursor)
+        self._evict_over_cap()
+
+    def _commit_turn(self, session_id: str, meta: SessionState, delta: dict):
+        now = time.time()
+        key = self._key(session_id)
+        # turn_count by HINCRBY, flags only ever set - never overwrite another worker's turn
+        args, unset = ["last_seen", now], []
+        for field, value in meta.to_row().items():
+            if field in ("submitted", "scam_detected") and not value:
+                unset.append(("HSETNX", key, field, 0))
+            elif field != "turn_count":
+                args += [field, value]
+        commands = [("HSET", key, *args), *unset,
+                    ("HINCRBY", key, "turn_count", delta.get("turns", 0)),
+                    ("HMGET", key, "submitted", "scam_detected"),
+                    ("ZADD", self.index_key, now, session_id)]
+        counters = len(unset) + 1  # replies[counters] = turn_count, then the flags
+        pushed = []  # (cursor field, how many we pushed)
+        if delta.get("history"):
+            commands.append(("RPUSH", self._key(session_id, "history"), *delta["history"]))
+            pushed.append(("history", len(delta["history"])))
+        lists = dict(delta.get("intel", {}))
+        if delta.get("keywords"):
+            lists["keywords"] = delta["keywords"]
+        for field, new in lists.items():
+            commands.append(("RPUSH", self._key(session_id, field), *new))
+            pushed.append((field, len(new)))
+        replies = self.client.pipeline(commands)
+        self._apply_counters(meta, *replies[counters + 1], replies[counters])
+
+        entry = self._cached(session_id)
+        if entry is None:
+            return
+        cursor = entry[1]
+        for (field, count), length in zip(pushed, replies[counters + 3:]):
+            if length == cursor[field] + count:
+                cursor[field] = length
+            elif field == "history":
+                self._forget(session_id)  # another worker appended in between - reload fully next turn
+                return
+            # intel / keywords are idempotent: leave the cursor, they get re-read once
+
+    def _evict(self, session_id: str, reason: str, last_seen: float):
+        """
+        Claim only the state that was picked (score == last_seen): WATCH the hash every
+        load / commit writes, so a turn landing in between aborts the EXEC
+        """
+        self._forget(session_id)
+        _, score = self.client.pipeline([("WATCH", self._key(session_id)),
+                                         ("ZSCORE", self.index_key, session_id)])
+        if score is None or float(score) != last_seen:
+            self.client.execute("UNWATCH")
+            return
+        meta, cursor = SessionState("english", "north_indian"), self._new_cursor()
+        values = self._read(session_id, meta, cursor)
+        replies = self.client.pipeline([("MULTI",),
+                                        ("ZREM", self.index_key, session_id),
+                                        ("DEL", *self._all_keys(session_id)),
+                                        ("EXEC",)])
+        if not replies[-1] or not replies[-1][0]:
+            return  # touched (or claimed) by another worker meanwhile
+        self._finalize(session_id, meta if values else None, reason)
+
+    @staticmethod
+    def _scored(reply) -> list:
+        return [(session_id, float(score)) for session_id, score in zip(reply[::2], reply[1::2])]
+
+    def _evict_over_cap(self) -> int:
+        over = self._count() - self.max_sessions
+        if over <= 0:
+            return 0
+        picked = self._scored(self.client.execute("ZRANGE", self.index_key, 0, over - 1, "WITHSCORES"))
+        for session_id, last_seen in picked:
+            self._evict(session_id, "lru", last_seen)
+        self.live_sessions -= len(picked)
+        return len(picked)
+
+    def _sweep(self) -> int:
+        count = 0
+        if self.ttl_seconds:
+            picked = self._scored(self.client.execute(
+                "ZRANGEBYSCORE", self.index_key, "-inf", time.time() - self.ttl_seconds, "WITHSCORES"
+            ))
+            for session_id, last_seen in picked:
+                self._evict(session_id, "ttl", last_seen)
+            count += len(picked)
+        return count + self._evict_over_cap()
+
+    def _read_totals(self) -> dict:
+        totals = _empty_totals()
+        session_ids = self.client.execute("ZRANGE", self.index_key, 0, -1)
+        totals["total_sessions"] = len(session_ids)
+        commands = []
+        for session_id in session_ids:
+            commands.append(("HMGET", self._key(session_id), "scam_detected", "submitted"))
+            commands += [("LLEN", self._key(session_id, field)) for field in INTEL_FIELDS]
+        replies = self.client.pipeline(commands)
+        step = 1 + len(INTEL_FIELDS)
+        for i in range(0, len(replies), step):
+            scam_detected, submitted = replies[i]
+            totals["scams_detected"] += scam_detected == "1"
+            totals["submitted"] += submitted == "1"
+            for field, count in zip(INTEL_FIELDS, replies[i + 1:i + step]):
+                totals["intel"][field] += count
+        return totals
+
+    def __len__(self):
+        return self.client.execute("ZCARD", self.index_key)
+
+
+# ========================
+# 5. PER-SESSION ORDERING
+# ========================
+class SessionLocks:
+    """
+    One asyncio.Lock per sessionId so turns of a session apply strictly in
+    arrival order (asyncio.Lock wakes waiters FIFO) while different sessions
+    run fully in parallel. An entry lives only while someone holds or waits
+    on it, so the map is bounded by in-flight requests.
+    Per process only: turns of one session on different workers still overlap;
+    shared stores keep their counters / flags right by committing them as deltas.
+    """
+
+    def __init__(self):
+        self._locks = {}  # sessionId -> [lock, holders + waiters]
+        self.acquired = 0
+        self.contended = 0
+        self.max_waiters = 0
+        self.waits = deque(maxlen=500)  # time spent waiting for the lock (seconds)
+
+    @asynccontextmanager
+    async def hold(self, session_id: str):
+        entry = self._locks.get(session_id)
+        if entry is None:
+            entry = self._locks[session_id] = [asyncio.Lock(), 0]
+        lock = entry[0]
+        entry[1] += 1
+        if lock.locked():
+            self.contended += 1
+            self.max_waiters = max(self.max_waiters, entry[1] - 1)
+
+        start = time.perf_counter()
+        try:
+            await lock.acquire()
+        except BaseException:
+            self._release_entry(session_id, entry)
+            raise
+        self.waits.append(time.perf_counter() - start)
+        self.acquired += 1
+
+        try:
+            yield
+        finally:
+            lock.release()
+            self._release_entry(session_id, entry)
+
+    def _release_entry(self, session_id: str, entry: list):
+        entry[1] -= 1
+        if entry[1] == 0 and self._locks.get(session_id) is entry:
+            del self._locks[session_id]
+
+    def stats(self) -> dict:
+        return {
+            "active": len(self._locks),
+            "acquired": self.acquired,
+            "contended": self.contended,
+            "max_waiters": self.max_waiters,
+            "wait_ms": latency_summary(self.waits, digits=2)
+        }
+
+
+# ========================
+# 6. FACTORY
+# ========================
+def open_session_store(url: str = SESSION_BACKEND, on_evict=None) -> SessionBackend:
+    """Build the store named by SESSION_BACKEND"""
+    if not url or url == "memory":
+        return MemorySessionStore(on_evict=on_evict)
+
+    parsed = urlparse(url)
+    if parsed.scheme == "sqlite":
+        # sqlite:///relative.db, sqlite:////absolute/path.db
+        path = url[len("sqlite:///"):] if url.startswith("sqlite:///") else url[len("sqlite:"):]
+        return SqliteSessionStore(unquote(path) or "sessions.db", on_evict=on_evict)
+
+    if parsed.scheme == "redis":
+        client = RespClient(
+            host=parsed.hostname or "localhost",
+            port=parsed.port or 6379,
+            db=int(parsed.path.lstrip("/") or 0),
+            password=unquote(parsed.password) if parsed.password else None
+        )
+        return RedisSessionStore(client, on_evict=on_evict)
+
+    raise ValueError(f"Unknown SESSION_BACKEND: {url}")
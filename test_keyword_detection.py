@@ -0,0 +1,49 @@
+"""
+detect_* on representative lines, against what the original substring
+matching returned. Only the FIXED lines may differ from it.
+"""
+
+import os
+
+import pytest
+
+os.environ.setdefault("GEMINI_API_KEY", "test")
+
+from main import detect_language_style, detect_scam_advanced, detect_user_region
+
+# text -> (language, region, scam type) as the original detectors returned them
+BASELINE = [
+    ("Aapka bank account block ho jayega, verify now", "hinglish", "north_indian", "bank_fraud"),
+    ("Aapko abhi payment karna padega", "hinglish", "north_indian", "upi_scam"),
+    ("Sir, account suspend hone wala hai. Last warning hai ye.", "hinglish", "north_indian", "bank_fraud"),
+    ("Main nahin jaanta, kya hua?", "hinglish", "north_indian", "unknown"),
+    ("Bhai jaldi karo, turant OTP bhejo", "hinglish", "north_indian", "unknown"),
+    ("Theek hai, batao kaise karna hai", "hinglish", "north_indian", "unknown"),
+    ("Haanji, bolo na", "hinglish", "north_indian", "unknown"),
+    ("Namaste, main bank se bol raha hoon, aapke account mein problem hai", "hinglish", "north_indian", "bank_fraud"),
+    ("Your account will be suspended today, verify now", "english", "north_indian", "bank_fraud"),
+    ("Congratulations! You have won a lottery prize, claim now", "english", "north_indian", "prize_scam"),
+    ("Please update your KYC immediately or your card will be blocked", "hinglish", "north_indian", "verification_scam"),
+    ("Dear customer, your electricity connection will be disconnected tonight", "english", "north_indian", "unknown"),
+    ("Enna sir, puriyala, what is this?", "hinglish", "tamil", "unknown"),
+    ("Ki hoyeche? Bhalo kore bolo", "hinglish", "bengali", "unknown"),
+    ("Enti sir, artham kaale", "hinglish", "telugu", "unknown"),
+    ("Yenu sir, gottagilla", "hinglish", "kannada", "unknown"),
+]
+
+# Substring false positives of the original matching, fixed on purpose
+FIXED = [
+    # 'illa' (kannada) inside 'manassilayilla'
+    ("Enthu sir, manassilayilla", "hinglish", "malayalam", "unknown"),
+    # 'ji' inside 'jio'
+    ("Your Jio number will be deactivated, call the officer", "english", "north_indian", "unknown"),
+    # 'seri' / 'enti' / 'sir' inside 'serious' / 'entire' / 'siren'
+    ("This is a serious issue with your entire account, siren alert", "english", "north_indian", "bank_fraud"),
+]
+
+
+@pytest.mark.parametrize("text, language, region, scam_type", BASELINE + FIXED)
+def test_detectors(text, language, region, scam_type):
+    assert detect_language_style(text) == language
+    assert detect_user_region(text) == region
+    assert detect_scam_advanced(text)["scam_type"] == scam_type
@@ -0,0 +1,196 @@
+"""
+RedisSessionStore against a fakeredis TCP server (pip install -r requirements-dev.txt)
+Two stores on one server play two uvicorn workers sharing the sessions.
+"""
+
+import asyncio
+import socket
+import threading
+import time
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from intel_store import IntelStore
+from session_state import SessionState
+from session_store import RedisSessionStore, RespClient
+
+
+@pytest.fixture
+def server():
+    srv = fakeredis.TcpFakeServer(("127.0.0.1", 0), server_type="redis")
+    srv.daemon_threads = True
+    srv.block_on_close = False
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    yield srv.server_address
+    srv.shutdown()
+    srv.server_close()
+
+
+@pytest.fixture
+def make_store(server):
+    clients = []
+
+    def make(**kwargs) -> RedisSessionStore:
+        client = RespClient(*server)
+        clients.append(client)
+        return RedisSessionStore(client, **kwargs)
+
+    yield make
+    for client in clients:
+        client.close()
+
+
+async def turn(store, session_id: str, line: str, upi: str = None) -> SessionState:
+    """One turn as main.handle_turn does it: load -> create -> mutate -> commit_turn"""
+    meta = await store.load(session_id)
+    if meta is None:
+        meta = SessionState("hinglish", "tamil", ["Scammer: hello"])
+        await store.create(session_id, meta)
+    meta.turn_count += 1
+    intel = IntelStore()
+    if upi:
+        intel.add("upiIds", upi)
+    new_intel = meta.intel.merge(intel)
+    keywords = meta.keywords.update(["bank", line])
+    lines = [f"Scammer: {line}", "You: ok"]
+    meta.history.extend(lines)
+    await store.commit_turn(session_id, meta, {
+        "history": lines, "intel": new_intel, "keywords": keywords, "turns": 1
+    })
+    return meta
+
+
+def test_workers_share_sessions(make_store):
+    async def run():
+        a, b = make_store(), make_store()
+        for i in range(5):
+            await turn(a if i % 2 == 0 else b, "s1", f"line{i}", f"u{i % 3}@ybl")
+
+        meta_a, meta_b = await a.load("s1"), await b.load("s1")
+        assert meta_a.history == meta_b.history
+        assert meta_a.history == ["Scammer: hello"] + [
+            line for i in range(5) for line in (f"Scammer: line{i}", "You: ok")
+        ]
+        assert meta_a.turn_count == meta_b.turn_count == 5
+        assert meta_b.intel.to_dict()["upiIds"] == ["u0@ybl", "u1@ybl", "u2@ybl"]
+        assert meta_b.keywords.to_list()[:2] == ["bank", "line0"]
+        assert b.incremental_loads > 0
+
+        totals = await a.totals()
+        assert totals["total_sessions"] == 1
+        assert totals["intel"]["upiIds"] == 3
+
+    asyncio.run(run())
+
+
+def test_concurrent_turns_keep_counters(make_store):
+    async def run():
+        a, b = make_store(), make_store()
+        await turn(a, "s1", "first")
+
+        # Both workers load the same state, then commit one turn each
+        meta_a, meta_b = await a.load("s1"), await b.load("s1")
+        meta_a.turn_count += 1
+        meta_a.submitted = True
+        await a.commit_turn("s1", meta_a, {"history": ["Scammer: a"], "turns": 1})
+        meta_b.turn_count += 1
+        await b.commit_turn("s1", meta_b, {"history": ["Scammer: b"], "turns": 1})
+
+        assert (meta_b.turn_count, meta_b.submitted) == (3, True)
+        stored = await make_store().load("s1")
+        assert (stored.turn_count, stored.submitted, stored.scam_detected) == (3, True, False)
+
+    asyncio.run(run())
+
+
+def test_eviction_hands_full_session_to_callback(make_store):
+    evicted = []
+
+    def on_evict(session_id, meta, reason):
+        evicted.append((session_id, reason, list(meta.history), meta.intel.to_dict()["upiIds"]))
+        return True
+
+    async def run():
+        store = make_store(on_evict=on_evict, max_sessions=1)
+        await turn(store, "old", "first", "a@ybl")
+        await turn(store, "new", "second")
+        assert evicted == [("old", "lru", ["Scammer: hello", "Scammer: first", "You: ok"], ["a@ybl"])]
+        assert await store.load("old") is None
+
+        store.ttl_seconds = 0.01
+        time.sleep(0.05)
+        assert await store.sweep() == 1
+        assert evicted[-1][:2] == ("new", "ttl")
+        assert store.stats()["finalized_on_evict"] == 2
+
+    asyncio.run(run())
+
+
+def test_pipeline_not_resent_after_lost_reply(make_store):
+    async def run():
+        store = make_store()
+        meta = await turn(store, "s1", "first")
+        history_key = store._key("s1", "history")
+
+        # The server applies the whole pipeline, then the client times out on the replies
+        roundtrip = store.client._roundtrip
+
+        def lost_replies(commands):
+            roundtrip(commands)
+            raise socket.timeout("timed out")
+
+        store.client._roundtrip = lost_replies
+        meta.history.append("Scammer: second")
+        with pytest.raises(OSError):
+            await store.commit_turn("s1", meta, {"history": ["Scammer: second"]})
+        store.client._roundtrip = roundtrip
+
+        assert store.client.execute("LRANGE", history_key, 0, -1) == [
+            "Scammer: hello", "Scammer: first", "You: ok", "Scammer: second"
+        ]
+
+    asyncio.run(run())
+
+
+def test_eviction_skips_session_touched_after_pick(make_store):
+    evicted = []
+
+    async def run():
+        a = make_store(on_evict=lambda session_id, meta, reason: evicted.append(session_id), ttl_seconds=0.01)
+        b = make_store()
+        await turn(b, "s1", "first")
+        time.sleep(0.05)
+
+        # a picks s1 as expired, b's next turn lands before a claims it
+        [(session_id, last_seen)] = a._scored(a.client.execute(
+            "ZRANGEBYSCORE", a.index_key, "-inf", time.time() - a.ttl_seconds, "WITHSCORES"
+        ))
+        await turn(b, "s1", "second")
+        await a._call(a._evict, session_id, "ttl", last_seen)
+
+        assert evicted == []
+        assert (await b.load("s1")).turn_count == 2
+
+        # b touches s1 after a's score check: WATCH aborts a's EXEC
+        time.sleep(0.05)
+        [(session_id, last_seen)] = a._scored(a.client.execute("ZRANGE", a.index_key, 0, -1, "WITHSCORES"))
+        read = a._read
+
+        def read_then_touch(*args):
+            b._load("s1")
+            return read(*args)
+
+        a._read = read_then_touch
+        await a._call(a._evict, session_id, "ttl", last_seen)
+        a._read = read
+        assert evicted == []
+
+        # Untouched since the pick: the claim goes through
+        time.sleep(0.05)
+        assert await a.sweep() == 1
+        assert evicted == ["s1"]
+        assert await b.load("s1") is None
+
+    asyncio.run(run())
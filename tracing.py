@@ -0,0 +1,154 @@
+"""
+Tracing - per-request spans for /honeypot
+Every stage timing goes through record_stage(): it always feeds the
+/metrics histogram and, while a request is being traced, also becomes a
+span of that request. Spans come back in a Server-Timing header and a
+sample of traces is written to a rotating JSONL file off the event loop.
+Disabled (the default) it costs one ContextVar lookup per stage.
+"""
+
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import time
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+
+from metrics import STAGE_SECONDS
+
+# ========================
+# Tuning
+# ========================
+TRACE_ENABLED = os.getenv("TRACE_ENABLED", "0") == "1"
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0.1"))  # share of traces written to TRACE_FILE
+TRACE_FILE = os.getenv("TRACE_FILE", "")  # empty = Server-Timing header only
+TRACE_FILE_MAX_BYTES = int(os.getenv("TRACE_FILE_MAX_BYTES", str(10 * 1024 * 1024)))
+TRACE_FILE_BACKUPS = int(os.getenv("TRACE_FILE_BACKUPS", "3"))
+
+# The trace of the request being handled (copied into tasks it spawns)
+_current = ContextVar("honeypot_trace", default=None)
+
+
+def record_stage(name: str, start: float, end: float):
+    """Stage timing (perf_counter values) -> metrics histogram + current trace"""
+    STAGE_SECONDS.observe(end - start, name)
+    trace = _current.get()
+    if trace is not None:
+        trace.spans.append((name, start, end))
+
+
+class Trace:
+    """Spans of one request: (name, start, end) in perf_counter time"""
+
+    __slots__ = ("trace_id", "endpoint", "session_id", "started", "spans", "_token")
+
+    def __init__(self, endpoint: str):
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.endpoint = endpoint
+        self.session_id = None
+        self.started = time.perf_counter()
+        self.spans = []
+        self._token = None
+
+    def server_timing(self, total: float) -> str:
+        parts = [f"{name};dur={(end - start) * 1000:.2f}" for name, start, end in self.spans]
+        parts.append(f"total;dur={total * 1000:.2f}")
+        return ", ".join(parts)
+
+    def to_record(self, total: float, status: int) -> dict:
+        return {
+            "ts": datetime.now(timezone.utc).isoformat(),
+            "trace_id": self.trace_id,
+            "endpoint": self.endpoint,
+            "session_id": self.session_id,
+            "status": status,
+            "total_ms": round(total * 1000, 3),
+            "spans": [
+                {
+                    "name": name,
+                    "start_ms": round((start - self.started) * 1000, 3),
+                    "dur_ms": round((end - start) * 1000, 3)
+                }
+                for name, start, end in self.spans
+            ]
+        }
+
+
+class Tracer:
+    """Starts / finishes request traces and exports a sample of them"""
+
+    def __init__(
+        self,
+        enabled: bool = TRACE_ENABLED,
+        sample_rate: float = TRACE_SAMPLE_RATE,
+        path: str = TRACE_FILE,
+        max_bytes: int = TRACE_FILE_MAX_BYTES,
+        backups: int = TRACE_FILE_BACKUPS,
+        rng=random
+    ):
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.rng = rng
+        self._logger = None
+        self._listener = None
+
+        # Metrics
+        self.traced = 0
+        self.exported = 0
+
+    def start(self):
+        """File writes happen on a listener thread, never on the event loop"""
+        if not (self.enabled and self.path):
+            return
+        handler = logging.handlers.RotatingFileHandler(
+            self.path, maxBytes=self.max_bytes, backupCount=self.backups, encoding="utf-8"
+        )
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        records = queue.SimpleQueue()
+        self._listener = logging.handlers.QueueListener(records, handler)
+        self._listener.start()
+        self._logger = logging.getLogger("honeypot.trace")
+        self._logger.propagate = False
+        self._logger.setLevel(logging.INFO)
+        self._logger.handlers = [logging.handlers.QueueHandler(records)]
+        print(f"🔎 Tracing to {self.path} (sample rate {self.sample_rate:g})")
+
+    def stop(self):
+        if self._listener is not None:
+            self._listener.stop()
+            self._listener = None
+            self._logger = None
+
+    def begin(self, endpoint: str):
+        """Trace for the current request, None when tracing is off"""
+        if not self.enabled:
+            return None
+        trace = Trace(endpoint)
+        trace._token = _current.set(trace)
+        return trace
+
+    def finish(self, trace: Trace, status: int = 200) -> str:
+        """Close the trace (same task as begin) -> Server-Timing header value"""
+        _current.reset(trace._token)
+        total = time.perf_counter() - trace.started
+        self.traced += 1
+        if self._logger is not None and self.rng.random() < self.sample_rate:
+            self.exported += 1
+            self._logger.info(json.dumps(trace.to_record(total, status), ensure_ascii=False))
+        return trace.server_timing(total)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "file": self.path or None,
+            "sample_rate": self.sample_rate,
+            "traced": self.traced,
+            "exported": self.exported
+        }